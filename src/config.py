@@ -153,6 +153,12 @@ PIPELINE_DEFAULTS = {
     #    'high_risk_only':True, # Change this to False for complete Knowledge Graph
     # },
 
+    # Phase 03: DQI Calculation - always recalculate inside a pipeline run
+    # (the phase's input cache is for standalone reruns)
+    '03': {
+        'force': True,
+    },
+
     # Phase 05: Recommendations Engine
     '05': {
         'model': 'mistral',
@@ -674,6 +674,21 @@ def build_master_tables(output_dir=None):
     _output_dir.mkdir(exist_ok=True)
     master_subject.to_csv(_output_dir / "master_subject.csv", index=False)
     print(f"[OK] Saved: {_output_dir}/master_subject.csv ({len(master_subject)} subjects)")
+    # Typed columnar copy for Phase 03 (read in preference to the CSV),
+    # written when the optional pyarrow extra is installed.
+    # Never leave a stale or partial Parquet copy next to the fresh CSV: drop
+    # the old one first and move the new one into place only once complete.
+    parquet_path = _output_dir / "master_subject.parquet"
+    parquet_tmp = parquet_path.with_name(parquet_path.name + ".tmp")
+    parquet_path.unlink(missing_ok=True)
+    try:
+        master_subject.to_parquet(parquet_tmp, engine="pyarrow", index=False)
+        parquet_tmp.replace(parquet_path)
+        print(f"[OK] Saved: {_output_dir}/master_subject.parquet")
+    except Exception as e:
+        parquet_tmp.unlink(missing_ok=True)
+        if not isinstance(e, ImportError):
+            print(f"[WARN] Parquet copy not written, Phase 03 will read the CSV: {e}")
     master_site.to_csv(_output_dir / "master_site.csv", index=False)
     print(f"[OK] Saved: {_output_dir}/master_site.csv ({len(master_site)} sites)")
     master_study.to_csv(_output_dir / "master_study.csv", index=False)
@@ -11,6 +11,10 @@ Prerequisites:
 Usage:
     python src/phases/03_calculate_dqi.py
 
+Input:
+    - outputs/phase02/master_subject.parquet is read when present (requires
+      pyarrow), otherwise outputs/phase02/master_subject.csv
+
 Output:
     - outputs/phase03/master_subject_with_dqi.csv    # Subjects with DQI scores
     - outputs/phase03/master_site_with_dqi.csv       # Sites with DQI and risk levels
@@ -27,10 +31,13 @@ DQI Scoring:
 """
 
 import sys
+import hashlib
+import json
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 
 warnings.filterwarnings('ignore')
 
@@ -43,6 +50,9 @@ _SRC_DIR = _SCRIPT_DIR.parent
 if str(_SRC_DIR) not in sys.path:
     sys.path.insert(0, str(_SRC_DIR))
 
+from utils.aggregation import aggregate_with_score_stats, count_by_group
+from utils.dqi_calculator import calculate_component_matrix
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -93,112 +103,216 @@ except ImportError:
         SITE_MEDIUM_PERCENTILE = 0.50
 
 MASTER_SUBJECT_PATH = PHASE_DIRS['phase_02'] / "master_subject.csv"
+MASTER_SUBJECT_PARQUET_PATH = MASTER_SUBJECT_PATH.with_suffix('.parquet')
+
+# Also write Parquet copies of the output tables (requires pyarrow; --parquet).
+# CSV stays the canonical format: downstream phases and the dashboard read it.
+SAVE_PARQUET = False
+
+# Signature of the inputs behind the last completed run; an unchanged
+# signature with all outputs present skips recomputation
+CACHE_SIG_PATH = PHASE_DIRS['phase_03'] / ".dqi_cache_sig"
+SCORING_CODE_PATHS = [
+    Path(__file__).resolve(), _SRC_DIR / "utils" / "dqi_calculator.py", _SRC_DIR / "utils" / "aggregation.py",
+]
+OUTPUT_FILES = [
+    "master_subject_with_dqi.csv", "master_site_with_dqi.csv", "master_study_with_dqi.csv",
+    "master_region_with_dqi.csv", "master_country_with_dqi.csv", "dqi_weights.csv", "dqi_model_report.txt",
+]
+
+# Subject and site risk categories, stored as ordered Categoricals in code
+# order (Low=0, Medium=1, High=2) so comparisons and counts run on int8 codes
+RISK_LEVELS = ['Low', 'Medium', 'High']
+
+# Grouping keys shared by the site -> study/region/country cascade
+GROUP_KEY_COLUMNS = ['study', 'site_id', 'country', 'region']
+
+# Identifier columns read with explicit dtypes (no type inference, and IDs
+# that look numeric keep their exact text). Grouping keys are parsed straight
+# into string categoricals, so encode_group_keys has nothing left to convert
+MASTER_KEY_DTYPES = {'subject_id': str, **{col: 'category' for col in GROUP_KEY_COLUMNS}}
 
 _total_weight = sum(f['weight'] for f in FEATURE_WEIGHTS.values())
 assert abs(_total_weight - 1.0) < 0.001, f"Weights must sum to 1.0, got {_total_weight}"
 
+# Methodology view, fixed at import: features by descending weight, and the
+# total weight of each clinical tier
+FEATURES_BY_WEIGHT = sorted(FEATURE_WEIGHTS.items(), key=lambda x:(-x[1]['weight']))
+_tier_codes, _tier_names = pd.factorize(np.array([c['tier'] for c in FEATURE_WEIGHTS.values()]))
+_weights = np.fromiter((c['weight'] for c in FEATURE_WEIGHTS.values()), dtype=float, count=len(FEATURE_WEIGHTS))
+TIER_WEIGHTS = dict(zip(_tier_names, np.bincount(_tier_codes, weights=_weights)))
+
 
 # ============================================================================
 # SCORING FUNCTIONS
 # ============================================================================
 
-def calculate_component_score(series, weight):
-    """Calculate weighted score for a single feature using Binary + Severity."""
-    if series.max()==0:
-        return pd.Series(0.0, index=series.index)
+def calculate_reference_max(values):
+    """Severity reference: P95 of the non-zero values (their max when too few).
 
-    binary = (series > 0).astype(float)
-    non_zero_values = series[series > 0]
+    np.quantile selects the bracketing order statistics by partition (O(n)),
+    so no per-feature sort is needed; it interpolates linearly like pandas.
+    """
+    non_zero_values = values[values > 0]
     MIN_SAMPLES = getattr(THRESHOLDS, 'MIN_SAMPLES_FOR_PERCENTILE', 20)
 
     if len(non_zero_values) >= MIN_SAMPLES:
-        p95 = non_zero_values.quantile(0.95)
-        reference_max = p95 if p95 > 0 else non_zero_values.max()
+        p95 = np.quantile(non_zero_values, 0.95)
+        return p95 if p95 > 0 else non_zero_values.max()
     elif len(non_zero_values) > 0:
-        reference_max = non_zero_values.max()
-    else:
-        reference_max = 1.0
+        return non_zero_values.max()
+    return 1.0
 
-    severity = (series / reference_max).clip(0, 1)
-    score = weight * (0.5 * binary + 0.5 * severity)
-    return score
 
+def build_feature_matrix(df):
+    """Compute n_issue_types and the column-major (subjects x features) matrix.
 
-def calculate_subject_dqi(df):
-    """Calculate DQI score for each subject."""
-    df = df.copy()
+    Returns (features, X). calculate_dqi builds this once on load and hands
+    it to both the scoring and the risk-assignment steps.
+    """
     issue_columns = [col for col in FEATURE_WEIGHTS.keys() if col in df.columns and col!='n_issue_types']
-    df['n_issue_types'] = (df[issue_columns] > 0).sum(axis=1)
+    issue_values = df[issue_columns].to_numpy(dtype=float)
+    df['n_issue_types'] = np.count_nonzero(issue_values > 0, axis=1)
 
-    df['dqi_score'] = 0.0
-    components = {}
+    # Reuse the issue columns already extracted above
+    features = [f for f in FEATURE_WEIGHTS.keys() if f in df.columns]
+    feature_columns = dict(zip(issue_columns, issue_values.T))
+    feature_columns['n_issue_types'] = df['n_issue_types'].to_numpy(dtype=float)
+    X = np.array([feature_columns[f] for f in features]).T  # column-major
+    return features, X
 
-    for feature, config in FEATURE_WEIGHTS.items():
-        if feature not in df.columns:
-            continue
-        component = calculate_component_score(df[feature], config['weight'])
+
+def calculate_subject_dqi(df, feature_matrix=None):
+    """Calculate DQI score for each subject.
+
+    Adds n_issue_types, dqi_score and *_component columns to df in place
+    (no copy of the master table) and returns it with the component stats.
+    """
+    if feature_matrix is None:
+        feature_matrix = build_feature_matrix(df)
+    features, X = feature_matrix
+
+    # One issue mask (X > 0), shared by the reference max, scores and stats
+    has_issue = X > 0
+    subjects_with_issue = np.count_nonzero(has_issue, axis=0)
+
+    # Score every feature in one matrix pass
+    weights = np.array([FEATURE_WEIGHTS[f]['weight'] for f in features])
+    reference_max = np.array([calculate_reference_max(X[has_issue[:, j], j]) for j in range(len(features))])
+    component_matrix = calculate_component_matrix(X, weights, reference_max, issue_mask=has_issue)
+
+    df['dqi_score'] = np.clip(component_matrix.sum(axis=1), 0, 1)
+
+    components = {}
+    for j, feature in enumerate(features):
+        component = component_matrix[:, j]
         df[f'{feature}_component'] = component
-        df['dqi_score'] += component
 
         components[feature] = {
-            'weight':config['weight'],
-            'tier':config['tier'],
-            'subjects_with_issue':(df[feature] > 0).sum(),
-            'mean_raw_value':df[feature].mean(),
-            'max_raw_value':df[feature].max(),
-            'mean_component':component.mean(),
-            'max_component':component.max(),
+            'weight':FEATURE_WEIGHTS[feature]['weight'],
+            'tier':FEATURE_WEIGHTS[feature]['tier'],
+            'subjects_with_issue':subjects_with_issue[j],
+            'mean_raw_value':np.nanmean(X[:, j]),
+            'max_raw_value':np.nanmax(X[:, j]),
+            'mean_component':np.nanmean(component),
+            'max_component':np.nanmax(component),
         }
 
-    df['dqi_score'] = df['dqi_score'].clip(0, 1)
     return df, components
 
 
-def assign_risk_categories(df):
-    """Assign risk categories based on DQI score with guaranteed capture."""
-    df = df.copy()
-    df['has_issues'] = (df['n_issue_types'] > 0).astype(int)
+def assign_risk_categories(df, feature_matrix=None):
+    """Assign risk categories based on DQI score with guaranteed capture.
 
-    sae_mask = pd.Series(False, index=df.index)
-    if 'sae_pending_count' in df.columns:
-        sae_mask = df['sae_pending_count'] > 0
+    Adds has_issues and risk_category to df in place and returns it. The SAE
+    mask is read from feature_matrix (see build_feature_matrix) when given.
+    """
+    has_issues = df['n_issue_types'].to_numpy() > 0
+    df['has_issues'] = has_issues.astype(int)
+    scores = df['dqi_score'].to_numpy()
+
+    sae_mask = np.zeros(len(df), dtype=bool)
+    if feature_matrix is not None and 'sae_pending_count' in feature_matrix[0]:
+        features, X = feature_matrix
+        sae_mask = X[:, features.index('sae_pending_count')] > 0
+    elif 'sae_pending_count' in df.columns:
+        sae_mask = df['sae_pending_count'].to_numpy() > 0
 
-    non_sae_with_issues = df[(df['has_issues']==1) & (~sae_mask)]
+    # P90 of the non-SAE scores with issues, by partition rather than a sort
+    non_sae_scores = scores[has_issues & ~sae_mask]
 
-    if len(non_sae_with_issues) > 0:
-        high_threshold = non_sae_with_issues['dqi_score'].quantile(0.90)
+    if len(non_sae_scores) > 0:
+        high_threshold = np.quantile(non_sae_scores, 0.90)
         high_threshold = max(high_threshold, 0.10)
     else:
         high_threshold = 0.20
 
     medium_threshold = 0.001
 
-    df['risk_category'] = 'Low'
-    df.loc[df['has_issues']==1, 'risk_category'] = 'Medium'
-    df.loc[(~sae_mask) & (df['dqi_score'] >= high_threshold), 'risk_category'] = 'High'
-    df.loc[sae_mask, 'risk_category'] = 'High'
+    # High: SAE override or score above threshold; Medium: any other issue
+    high = sae_mask | (scores >= high_threshold)
+    df['risk_category'] = pd.Categorical.from_codes(
+        np.select([high, has_issues], [2, 1], default=0), categories=RISK_LEVELS, ordered=True)
 
     overrides = {}
     if 'sae_pending_count' in df.columns:
-        sae_below_threshold = sae_mask & (df['dqi_score'] < high_threshold)
-        overrides['sae_to_high'] = sae_below_threshold.sum()
+        overrides['sae_to_high'] = np.count_nonzero(sae_mask & (scores < high_threshold))
 
     thresholds = {'high':high_threshold, 'medium':medium_threshold}
     return df, thresholds, overrides
 
 
-def aggregate_site_dqi(df):
-    """Aggregate subject-level DQI to site level."""
-    df = df.copy()
-    df['is_high'] = (df['risk_category']=='High').astype(int)
-    df['is_medium'] = (df['risk_category']=='Medium').astype(int)
+def downcast_counts(df):
+    """Store integer count/day columns as int32 when they fit (halves their memory).
+
+    Scores and components stay float64: they are compared against
+    percentile thresholds and written to the outputs at full precision.
+    """
+    int32 = np.iinfo(np.int32)
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]) and df[col].dtype.itemsize > 4:
+            if len(df) == 0 or (df[col].min() >= int32.min and df[col].max() <= int32.max):
+                df[col] = df[col].astype(np.int32)
+    return df
+
+
+def encode_group_keys(df, columns=GROUP_KEY_COLUMNS):
+    """Dictionary-encode grouping keys as categoricals so groupbys hash integer codes.
+
+    Keys already read as categoricals are only brought into sorted category
+    order: read_csv merges per-chunk categories without sorting them, and the
+    aggregated tables are ordered by category.
+    """
+    for col in columns:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories
+            if not categories.is_monotonic_increasing:
+                df[col] = df[col].cat.reorder_categories(categories.sort_values())
+        else:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def count_sites(df):
+    """Number of distinct (study, site_id) pairs, from the categorical codes.
+
+    Pairs with a missing key are not counted, as in a groupby.
+    """
+    study = df['study'].cat.codes.to_numpy(dtype=np.int64)
+    site = df['site_id'].cat.codes.to_numpy(dtype=np.int64)
+    valid = (study >= 0) & (site >= 0)
+    pair_codes = study[valid] * len(df['site_id'].cat.categories) + site[valid]
+    return len(np.unique(pair_codes))
 
+
+def aggregate_site_dqi(df):
+    """Aggregate subject-level DQI to site level (df is not modified)."""
     agg_dict = {
         'subject_id':'count',
         'dqi_score':['mean', 'max', 'std'],
         'n_issue_types':['sum', 'mean'],
-        'is_high':'sum',
-        'is_medium':'sum',
         'has_issues':'sum',
     }
 
@@ -206,8 +320,14 @@ def aggregate_site_dqi(df):
         if feature in df.columns and feature!='n_issue_types':
             agg_dict[feature] = 'sum'
 
-    site_df = df.groupby(['study', 'site_id', 'country', 'region']).agg(agg_dict)
-    site_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in site_df.columns]
+    grouped = df.groupby(['study', 'site_id', 'country', 'region'], observed=True)
+    site_df = aggregate_with_score_stats(grouped, agg_dict, 'dqi_score')
+
+    # Risk category counts straight from the group codes (one bincount each)
+    risk = df['risk_category']
+    loc = site_df.columns.get_loc('has_issues_sum')
+    site_df.insert(loc, 'high_risk_count', count_by_group(grouped, (risk=='High').to_numpy()))
+    site_df.insert(loc + 1, 'medium_risk_count', count_by_group(grouped, (risk=='Medium').to_numpy()))
     site_df = site_df.reset_index()
 
     rename_map = {
@@ -217,8 +337,6 @@ def aggregate_site_dqi(df):
         'dqi_score_std':'std_dqi_score',
         'n_issue_types_sum':'total_issue_types',
         'n_issue_types_mean':'avg_issue_types',
-        'is_high_sum':'high_risk_count',
-        'is_medium_sum':'medium_risk_count',
         'has_issues_sum':'subjects_with_issues',
     }
     site_df = site_df.rename(columns=rename_map)
@@ -234,9 +352,10 @@ def aggregate_site_dqi(df):
         site_high_thresh = 0.10
         site_med_thresh = 0.05
 
-    site_df['site_risk_category'] = 'Low'
-    site_df.loc[site_df['avg_dqi_score'] >= site_med_thresh, 'site_risk_category'] = 'Medium'
-    site_df.loc[site_df['avg_dqi_score'] >= site_high_thresh, 'site_risk_category'] = 'High'
+    site_scores = site_df['avg_dqi_score'].to_numpy()
+    site_df['site_risk_category'] = pd.Categorical.from_codes(
+        np.select([site_scores >= site_high_thresh, site_scores >= site_med_thresh], [2, 1], default=0),
+        categories=RISK_LEVELS, ordered=True)
 
     site_thresholds = {'high':site_high_thresh, 'medium':site_med_thresh}
     return site_df, site_thresholds
@@ -260,9 +379,8 @@ def aggregate_to_study_level(site_df):
         if col in site_df.columns:
             agg_dict[col] = 'sum'
 
-    study_df = site_df.groupby('study').agg(agg_dict)
-    study_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in study_df.columns]
-    study_df = study_df.reset_index()
+    grouped = site_df.groupby('study', observed=True)
+    study_df = aggregate_with_score_stats(grouped, agg_dict, 'avg_dqi_score').reset_index()
 
     rename_map = {
         'site_id_count':'site_count',
@@ -281,8 +399,8 @@ def aggregate_to_study_level(site_df):
     study_df['high_risk_rate'] = study_df['high_risk_subjects'] / study_df['subject_count']
     study_df['issue_rate'] = study_df['subjects_with_issues'] / study_df['subject_count']
 
-    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('study').size()
-    study_df['high_risk_sites'] = study_df['study'].map(high_risk_sites).fillna(0).astype(int)
+    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('study', observed=True).size()
+    study_df['high_risk_sites'] = high_risk_sites.reindex(study_df['study'], fill_value=0).to_numpy()
     study_df['high_risk_site_rate'] = study_df['high_risk_sites'] / study_df['site_count']
 
     studies_with_issues = study_df[study_df['avg_dqi_score'] > 0]['avg_dqi_score']
@@ -312,9 +430,8 @@ def aggregate_to_region_level(site_df):
         'high_risk_count':'sum', 'medium_risk_count':'sum', 'subjects_with_issues':'sum',
         'study':'nunique', 'country':'nunique',
     }
-    region_df = site_df.groupby('region').agg(region_agg)
-    region_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in region_df.columns]
-    region_df = region_df.reset_index()
+    grouped = site_df.groupby('region', observed=True)
+    region_df = aggregate_with_score_stats(grouped, region_agg, 'avg_dqi_score').reset_index()
     region_df = region_df.rename(columns={
         'site_id_count':'site_count', 'subject_count_sum':'subject_count',
         'avg_dqi_score_mean':'avg_dqi_score', 'avg_dqi_score_max':'max_dqi_score',
@@ -325,13 +442,13 @@ def aggregate_to_region_level(site_df):
     region_df['std_dqi_score'] = region_df['std_dqi_score'].fillna(0)
     region_df['high_risk_rate'] = region_df['high_risk_subjects'] / region_df['subject_count']
     region_df['issue_rate'] = region_df['subjects_with_issues'] / region_df['subject_count']
-    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('region').size()
-    region_df['high_risk_sites'] = region_df['region'].map(high_risk_sites).fillna(0).astype(int)
+    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('region', observed=True).size()
+    region_df['high_risk_sites'] = high_risk_sites.reindex(region_df['region'], fill_value=0).to_numpy()
     region_df['high_risk_site_rate'] = region_df['high_risk_sites'] / region_df['site_count']
-    region_df['region_risk_category'] = 'Low'
-    region_df.loc[region_df['avg_dqi_score'] >= region_df['avg_dqi_score'].median(), 'region_risk_category'] = 'Medium'
-    region_df.loc[
-        region_df['avg_dqi_score'] >= region_df['avg_dqi_score'].quantile(0.75), 'region_risk_category'] = 'High'
+    region_scores = region_df['avg_dqi_score'].to_numpy()
+    region_med, region_high = np.quantile(region_scores, [0.50, 0.75])
+    region_df['region_risk_category'] = np.select(
+        [region_scores >= region_high, region_scores >= region_med], ['High', 'Medium'], default='Low')
 
     # Country aggregation
     country_agg = {
@@ -339,9 +456,8 @@ def aggregate_to_region_level(site_df):
         'high_risk_count':'sum', 'medium_risk_count':'sum', 'subjects_with_issues':'sum',
         'study':'nunique', 'region':'first',
     }
-    country_df = site_df.groupby('country').agg(country_agg)
-    country_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col for col in country_df.columns]
-    country_df = country_df.reset_index()
+    grouped = site_df.groupby('country', observed=True)
+    country_df = aggregate_with_score_stats(grouped, country_agg, 'avg_dqi_score').reset_index()
     country_df = country_df.rename(columns={
         'site_id_count':'site_count', 'subject_count_sum':'subject_count',
         'avg_dqi_score_mean':'avg_dqi_score', 'avg_dqi_score_max':'max_dqi_score',
@@ -352,56 +468,125 @@ def aggregate_to_region_level(site_df):
     country_df['std_dqi_score'] = country_df['std_dqi_score'].fillna(0)
     country_df['high_risk_rate'] = country_df['high_risk_subjects'] / country_df['subject_count']
     country_df['issue_rate'] = country_df['subjects_with_issues'] / country_df['subject_count']
-    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('country').size()
-    country_df['high_risk_sites'] = country_df['country'].map(high_risk_sites).fillna(0).astype(int)
+    high_risk_sites = site_df[site_df['site_risk_category']=='High'].groupby('country', observed=True).size()
+    country_df['high_risk_sites'] = high_risk_sites.reindex(country_df['country'], fill_value=0).to_numpy()
     country_df['high_risk_site_rate'] = country_df['high_risk_sites'] / country_df['site_count']
-    country_df['country_risk_category'] = 'Low'
-    country_df.loc[
-        country_df['avg_dqi_score'] >= country_df['avg_dqi_score'].median(), 'country_risk_category'] = 'Medium'
-    country_df.loc[
-        country_df['avg_dqi_score'] >= country_df['avg_dqi_score'].quantile(0.80), 'country_risk_category'] = 'High'
+    country_scores = country_df['avg_dqi_score'].to_numpy()
+    country_med, country_high = np.quantile(country_scores, [0.50, 0.80])
+    country_df['country_risk_category'] = np.select(
+        [country_scores >= country_high, country_scores >= country_med], ['High', 'Medium'], default='Low')
 
     return region_df, country_df
 
 
-def validate_results(df, site_df, thresholds):
-    """Run validation checks on the DQI results."""
+# ============================================================================
+# I/O HELPERS
+# ============================================================================
+
+def load_master_subject():
+    """Load the Phase 02 master subject table, preferring the Parquet copy.
+
+    The Parquet copy is converted with self_destruct, which frees each Arrow
+    column once it has been converted. Peak memory then stays near one copy of
+    the table instead of two.
+    """
+    if MASTER_SUBJECT_PARQUET_PATH.exists():
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            pass
+        else:
+            table = pq.read_table(MASTER_SUBJECT_PARQUET_PATH)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
+            return df, MASTER_SUBJECT_PARQUET_PATH
+    return pd.read_csv(MASTER_SUBJECT_PATH, dtype=MASTER_KEY_DTYPES), MASTER_SUBJECT_PATH
+
+
+def input_signature():
+    """Hash the master table inputs, the weights and thresholds, and the scoring code.
+
+    The source of this module and of the utils it scores with is part of the
+    hash, so editing the scoring code invalidates the cached outputs.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for path in (MASTER_SUBJECT_PATH, MASTER_SUBJECT_PARQUET_PATH, *SCORING_CODE_PATHS):
+        if path.exists():
+            h.update(path.name.encode())
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+    thresholds = {name: getattr(THRESHOLDS, name) for name in dir(THRESHOLDS) if name.isupper()}
+    settings = {'weights': FEATURE_WEIGHTS, 'thresholds': thresholds, 'save_parquet': SAVE_PARQUET}
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def outputs_up_to_date(signature):
+    """True if the last run used the same inputs and all its outputs still exist."""
+    if not CACHE_SIG_PATH.exists() or CACHE_SIG_PATH.read_text().strip() != signature:
+        return False
+    return all((PHASE_DIRS['phase_03'] / name).exists() for name in OUTPUT_FILES)
+
+
+def save_table(df, filename):
+    """Write an output table as CSV, plus a Parquet copy when SAVE_PARQUET is set."""
+    path = PHASE_DIRS['phase_03'] / filename
+    df.to_csv(path, index=False)
+    if SAVE_PARQUET:
+        try:
+            df.to_parquet(path.with_suffix('.parquet'), engine='pyarrow', compression='zstd', index=False)
+        except ImportError:
+            print(f"  [WARN] pyarrow not available, skipping {path.with_suffix('.parquet').name}")
+
+
+def validate_results(df, site_df, thresholds, risk_counts=None, site_risk_counts=None,
+                     subjects_with_issues=None):
+    """Run validation checks on the DQI results.
+
+    risk_counts and site_risk_counts are the value_counts of risk_category and
+    site_risk_category, and subjects_with_issues the has_issues total;
+    calculate_dqi passes the ones it has already computed.
+    """
     validations = {}
+    # One count per category instead of a comparison scan per check
+    if risk_counts is None:
+        risk_counts = df['risk_category'].value_counts()
+    if site_risk_counts is None:
+        site_risk_counts = site_df['site_risk_category'].value_counts()
 
     if 'sae_pending_count' in df.columns:
-        sae_subjects = df[df['sae_pending_count'] > 0]
-        sae_in_high = (sae_subjects['risk_category']=='High').sum()
+        sae_mask = df['sae_pending_count'].to_numpy() > 0
+        total_sae = np.count_nonzero(sae_mask)
+        sae_in_high = np.count_nonzero(sae_mask & (df['risk_category']=='High').to_numpy())
         validations['sae_capture'] = {
-            'total_sae':len(sae_subjects), 'in_high':sae_in_high,
-            'rate':sae_in_high / len(sae_subjects) if len(sae_subjects) > 0 else 1.0,
-            'pass':sae_in_high==len(sae_subjects)
+            'total_sae':total_sae, 'in_high':sae_in_high,
+            'rate':sae_in_high / total_sae if total_sae > 0 else 1.0,
+            'pass':sae_in_high==total_sae
         }
 
-    subjects_with_issues = df['has_issues'].sum()
-    flagged = (df['risk_category']!='Low').sum()
+    if subjects_with_issues is None:
+        subjects_with_issues = df['has_issues'].sum()
+    flagged = len(df) - risk_counts.get('Low', 0)
     validations['capture_rate'] = {
         'subjects_with_issues':subjects_with_issues, 'flagged':flagged,
         'rate':flagged / subjects_with_issues if subjects_with_issues > 0 else 0,
         'pass':(flagged / subjects_with_issues >= 0.99) if subjects_with_issues > 0 else True
     }
 
-    high_count = (df['risk_category']=='High').sum()
-    medium_count = (df['risk_category']=='Medium').sum()
+    high_count = risk_counts.get('High', 0)
+    medium_count = risk_counts.get('Medium', 0)
     validations['pyramid_shape'] = {'high':high_count, 'medium':medium_count, 'pass':medium_count >= high_count}
 
-    site_high = (site_df['site_risk_category']=='High').sum()
-    site_medium = (site_df['site_risk_category']=='Medium').sum()
+    site_high = site_risk_counts.get('High', 0)
+    site_medium = site_risk_counts.get('Medium', 0)
     validations['site_pyramid'] = {'high':site_high, 'medium':site_medium, 'pass':site_medium >= site_high}
 
-    high_scores = df[df['risk_category']=='High']['dqi_score']
-    medium_scores = df[df['risk_category']=='Medium']['dqi_score']
-    low_scores = df[df['risk_category']=='Low']['dqi_score']
+    # Empty categories count as a mean of 0
+    means = df.groupby('risk_category', observed=True)['dqi_score'].mean().reindex(RISK_LEVELS, fill_value=0)
     validations['score_alignment'] = {
-        'high_mean':high_scores.mean() if len(high_scores) > 0 else 0,
-        'medium_mean':medium_scores.mean() if len(medium_scores) > 0 else 0,
-        'low_mean':low_scores.mean() if len(low_scores) > 0 else 0,
-        'pass':(high_scores.mean() if len(high_scores) > 0 else 0) > (
-            medium_scores.mean() if len(medium_scores) > 0 else 0) > (low_scores.mean() if len(low_scores) > 0 else 0)
+        'high_mean':means['High'], 'medium_mean':means['Medium'], 'low_mean':means['Low'],
+        'pass':means['High'] > means['Medium'] > means['Low']
     }
 
     return validations
@@ -411,8 +596,12 @@ def validate_results(df, site_df, thresholds):
 # MAIN FUNCTION
 # ============================================================================
 
-def calculate_dqi():
-    """Main function to calculate and save DQI scores."""
+def calculate_dqi(force=False):
+    """Main function to calculate and save DQI scores.
+
+    Skips the run when the inputs are unchanged since the last run and all
+    outputs are present, unless force is set.
+    """
     print("=" * 70)
     print("JAVELIN.AI - DATA QUALITY INDEX (DQI) CALCULATION")
     print("=" * 70)
@@ -424,11 +613,22 @@ def calculate_dqi():
         print("Please run 02_build_master_table.py first.")
         return False
 
-    print(f"\nLoading {MASTER_SUBJECT_PATH}...")
-    df = pd.read_csv(MASTER_SUBJECT_PATH)
+    signature = input_signature()
+    if not force and outputs_up_to_date(signature):
+        print(f"\n[SKIP] Inputs unchanged since last run; outputs in {PHASE_DIRS['phase_03']} are current")
+        print("Use --force to recalculate.")
+        return True
+
+    df, source_path = load_master_subject()
+    print(f"\nLoading {source_path}...")
+    missing_keys = [col for col in MASTER_KEY_DTYPES if col not in df.columns]
+    if missing_keys:
+        print(f"\n[ERROR] Master table is missing required columns: {missing_keys}")
+        return False
+    df = encode_group_keys(downcast_counts(df))
     print(f"  Loaded {len(df):,} subjects")
     print(f"  Studies: {df['study'].nunique()}")
-    print(f"  Sites: {df.groupby(['study', 'site_id']).ngroups:,}")
+    print(f"  Sites: {count_sites(df):,}")
 
     # Step 1: Display Methodology
     print("\n" + "=" * 70)
@@ -439,42 +639,45 @@ def calculate_dqi():
     print("\nFeature Weights by Clinical Tier:")
     print("-" * 70)
     current_tier = None
-    total_weight = 0
-    for feature, config in sorted(FEATURE_WEIGHTS.items(), key=lambda x:(-x[1]['weight'])):
+    for feature, config in FEATURES_BY_WEIGHT:
         if config['tier']!=current_tier:
             current_tier = config['tier']
-            tier_weight = sum(f['weight'] for f in FEATURE_WEIGHTS.values() if f['tier']==current_tier)
-            print(f"\n[{current_tier.upper()}] - {tier_weight:.0%} total")
+            print(f"\n[{current_tier.upper()}] - {TIER_WEIGHTS[current_tier]:.0%} total")
         print(f"  {feature:<30} {config['weight']:>5.0%}  {config['rationale']}")
-        total_weight += config['weight']
-    print(f"\n{'TOTAL':<30} {total_weight:>5.0%}")
+    print(f"\n{'TOTAL':<30} {_total_weight:>5.0%}")
 
     # Step 2: Calculate Subject-Level DQI
     print("\n" + "=" * 70)
     print("STEP 2: CALCULATE SUBJECT-LEVEL DQI")
     print("=" * 70)
-    df, components = calculate_subject_dqi(df)
+    feature_matrix = build_feature_matrix(df)
+    df, components = calculate_subject_dqi(df, feature_matrix)
     print("\nComponent Statistics:")
     print(f"{'Feature':<30} {'Weight':>7} {'Subjects':>10} {'Max Score':>10}")
     print("-" * 60)
-    for feature, stats in sorted(components.items(), key=lambda x:-x[1]['weight']):
+    for feature, _ in FEATURES_BY_WEIGHT:
+        if feature not in components:
+            continue
+        stats = components[feature]
         print(
             f"{feature:<30} {stats['weight']:>6.0%} {stats['subjects_with_issue']:>10,} {stats['max_component']:>10.3f}")
+    score_min, score_median, score_max = np.quantile(df['dqi_score'].to_numpy(), [0, 0.5, 1])
     print(f"\nDQI Score Distribution:")
-    print(f"  Min:    {df['dqi_score'].min():.4f}")
-    print(f"  Median: {df['dqi_score'].median():.4f}")
-    print(f"  Max:    {df['dqi_score'].max():.4f}")
+    print(f"  Min:    {score_min:.4f}")
+    print(f"  Median: {score_median:.4f}")
+    print(f"  Max:    {score_max:.4f}")
 
     # Step 3: Assign Risk Categories
     print("\n" + "=" * 70)
     print("STEP 3: ASSIGN RISK CATEGORIES")
     print("=" * 70)
-    df, thresholds, overrides = assign_risk_categories(df)
+    df, thresholds, overrides = assign_risk_categories(df, feature_matrix)
     print(f"\nThresholds:")
     print(f"  High:   SAE pending OR score >= {thresholds['high']:.4f}")
     print(f"  Medium: Any issue (score > 0)")
     print(f"  Low:    No issues")
     risk_counts = df['risk_category'].value_counts()
+    n_issues = int(df['has_issues'].sum())
     print("\nRisk Distribution:")
     for cat in ['High', 'Medium', 'Low']:
         count = risk_counts.get(cat, 0)
@@ -517,7 +720,7 @@ def calculate_dqi():
     print("\n" + "=" * 70)
     print("STEP 5: VALIDATION")
     print("=" * 70)
-    validations = validate_results(df, site_df, thresholds)
+    validations = validate_results(df, site_df, thresholds, risk_counts, site_risk_counts, n_issues)
     all_pass = True
     for check_name, result in validations.items():
         status = "PASS" if result['pass'] else "FAIL"
@@ -530,46 +733,58 @@ def calculate_dqi():
     print("STEP 6: SAVE OUTPUTS")
     print("=" * 70)
     PHASE_DIRS['phase_03'].mkdir(parents=True, exist_ok=True)
-    df_out = df.drop(columns=['is_high', 'is_medium'], errors='ignore')
-
-    df_out.to_csv(PHASE_DIRS['phase_03'] / "master_subject_with_dqi.csv", index=False)
-    print(f"\n[OK] Saved: master_subject_with_dqi.csv ({len(df_out):,} subjects)")
-
-    site_df.to_csv(PHASE_DIRS['phase_03'] / "master_site_with_dqi.csv", index=False)
-    print(f"[OK] Saved: master_site_with_dqi.csv ({len(site_df):,} sites)")
-
-    study_df.to_csv(PHASE_DIRS['phase_03'] / "master_study_with_dqi.csv", index=False)
-    print(f"[OK] Saved: master_study_with_dqi.csv ({len(study_df)} studies)")
 
-    region_df.to_csv(PHASE_DIRS['phase_03'] / "master_region_with_dqi.csv", index=False)
-    print(f"[OK] Saved: master_region_with_dqi.csv ({len(region_df)} regions)")
-
-    country_df.to_csv(PHASE_DIRS['phase_03'] / "master_country_with_dqi.csv", index=False)
-    print(f"[OK] Saved: master_country_with_dqi.csv ({len(country_df)} countries)")
-
-    # Save weights
-    weights_data = [{'feature':f, 'weight':c['weight'], 'tier':c['tier'], 'rationale':c['rationale']} for f, c in
-                    FEATURE_WEIGHTS.items()]
-    weights_df = pd.DataFrame(weights_data).sort_values('weight', ascending=False)
-    weights_df.to_csv(PHASE_DIRS['phase_03'] / "dqi_weights.csv", index=False)
-    print(f"[OK] Saved: dqi_weights.csv")
-
-    # Save report
-    with open(PHASE_DIRS['phase_03'] / "dqi_model_report.txt", 'w', encoding='utf-8') as f:
-        f.write("JAVELIN.AI - DATA QUALITY INDEX (DQI) MODEL REPORT\n")
-        f.write("=" * 60 + "\n\n")
-        f.write(f"Total Subjects: {len(df):,}\n")
-        f.write(f"Total Sites: {len(site_df):,}\n")
-        f.write(f"Studies: {df['study'].nunique()}\n")
-        f.write(f"Subjects with Issues: {df['has_issues'].sum():,} ({df['has_issues'].mean():.1%})\n\n")
-        f.write("RISK DISTRIBUTION\n" + "-" * 40 + "\n")
+    tables = [
+        (df, "master_subject_with_dqi.csv", f"{len(df):,} subjects"),
+        (site_df, "master_site_with_dqi.csv", f"{len(site_df):,} sites"),
+        (study_df, "master_study_with_dqi.csv", f"{len(study_df)} studies"),
+        (region_df, "master_region_with_dqi.csv", f"{len(region_df)} regions"),
+        (country_df, "master_country_with_dqi.csv", f"{len(country_df)} countries"),
+    ]
+    # The table writes are independent; they run in the background while the
+    # weights and report are built and written here
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = [executor.submit(save_table, table, filename) for table, filename, _ in tables]
+
+        # Save weights
+        weights_data = [{'feature':f, 'weight':c['weight'], 'tier':c['tier'], 'rationale':c['rationale']} for f, c in
+                        FEATURES_BY_WEIGHT]
+        weights_df = pd.DataFrame(weights_data)
+        weights_df.to_csv(PHASE_DIRS['phase_03'] / "dqi_weights.csv", index=False)
+
+        # Save report
+        lines = [
+            "JAVELIN.AI - DATA QUALITY INDEX (DQI) MODEL REPORT",
+            "=" * 60,
+            "",
+            f"Total Subjects: {len(df):,}",
+            f"Total Sites: {len(site_df):,}",
+            f"Studies: {df['study'].nunique()}",
+            f"Subjects with Issues: {n_issues:,} ({n_issues / len(df):.1%})",
+            "",
+            "RISK DISTRIBUTION",
+            "-" * 40,
+        ]
         for cat in ['High', 'Medium', 'Low']:
             count = risk_counts.get(cat, 0)
-            f.write(f"  {cat}: {count:,} ({count / len(df) * 100:.1f}%)\n")
-        f.write(f"\nCapture Rate: {validations['capture_rate']['rate']:.1%}\n")
-        f.write(f"SAE Capture: {validations['sae_capture']['rate']:.0%}\n")
+            lines.append(f"  {cat}: {count:,} ({count / len(df) * 100:.1f}%)")
+        lines += [
+            "",
+            f"Capture Rate: {validations['capture_rate']['rate']:.1%}",
+            f"SAE Capture: {validations['sae_capture']['rate']:.0%}",
+        ]
+        (PHASE_DIRS['phase_03'] / "dqi_model_report.txt").write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+        for future in futures:
+            future.result()
+    print()
+    for _, filename, summary in tables:
+        print(f"[OK] Saved: {filename} ({summary})")
+    print(f"[OK] Saved: dqi_weights.csv")
     print(f"[OK] Saved: dqi_model_report.txt")
 
+    CACHE_SIG_PATH.write_text(signature)
+
     print("\n" + "=" * 70)
     print("NEXT STEPS")
     print("=" * 70)
@@ -582,6 +797,17 @@ def calculate_dqi():
 
 
 if __name__=="__main__":
-    success = calculate_dqi()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JAVELIN.AI DQI Calculation")
+    parser.add_argument("--force", action="store_true",
+                        help="Recalculate even if inputs are unchanged since the last run")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Also write zstd Parquet copies of the output tables (requires pyarrow)")
+    args = parser.parse_args()
+    if args.parquet:
+        SAVE_PARQUET = True
+
+    success = calculate_dqi(force=args.force)
     if not success:
         exit(1)
@@ -17,11 +17,14 @@ Usage:
 CLI Options:
     --subgraphs         Comma-separated: 'highrisk', 'topstudies', 'sample', or 'all'
     --high-risk-only    Create ONLY the high-risk subgraph (fast mode)
+    --parquet           Also export the node/edge tables as Parquet (requires pyarrow)
+    --queries-only      Print the sample queries only; the graph is not built
 
 Output:
     - outputs/phase04/knowledge_graph.graphml           # Full graph for Gephi/yEd
     - outputs/phase04/knowledge_graph_nodes.csv         # Nodes for Neo4j import
     - outputs/phase04/knowledge_graph_edges.csv         # Edges for Neo4j import
+    - outputs/phase04/knowledge_graph_{nodes,edges}.parquet  # With --parquet
     - outputs/phase04/knowledge_graph_summary.json      # Graph statistics
     - outputs/phase04/knowledge_graph_report.txt        # Human-readable report
     - outputs/phase04/subgraph_*.graphml                # Filtered subgraphs
@@ -35,10 +38,12 @@ import sys
 import pandas as pd
 import numpy as np
 import networkx as nx
+from scipy import sparse
 import json
 import argparse
 from pathlib import Path
 from collections import defaultdict
+from contextlib import contextmanager
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -69,6 +74,137 @@ STUDY_PATH = PHASE_DIRS['phase_03'] / "master_study_with_dqi.csv"
 REGION_PATH = PHASE_DIRS['phase_03'] / "master_region_with_dqi.csv"
 COUNTRY_PATH = PHASE_DIRS['phase_03'] / "master_country_with_dqi.csv"
 
+# Columns of the phase 03 subject and site tables that the graph uses; the
+# component scores and other features are not parsed
+SUBJECT_COLUMNS = [
+    'study', 'subject_id', 'site_id', 'country', 'region', 'subject_status',
+    'dqi_score', 'risk_category', 'n_issue_types', 'has_issues', 'sae_pending_count',
+    'missing_visit_count', 'missing_pages_count', 'lab_issues_count'
+]
+SITE_COLUMNS = [
+    'study', 'site_id', 'country', 'region', 'subject_count', 'avg_dqi_score', 'max_dqi_score',
+    'high_risk_count', 'medium_risk_count', 'subjects_with_issues', 'site_risk_category'
+]
+
+# ============================================================================
+# COLUMN CONVERSION
+# ============================================================================
+# Node properties are stored as plain Python values, converted once per column
+
+def _values(column):
+    """Column values as Python objects."""
+    return column.tolist()
+
+
+def _ints(column):
+    """Column values as Python ints (tolist already yields them for integer dtypes)."""
+    if pd.api.types.is_integer_dtype(column):
+        return column.tolist()
+    return [int(v) for v in column.tolist()]
+
+
+def _scores(column):
+    """Floats rounded to 4 decimals (Python round, as stored in the graph)."""
+    return [round(float(v), 4) for v in column.tolist()]
+
+
+def _node_ids(prefix, *parts):
+    """Node ids of the form 'prefix:part1[:part2]' from aligned value lists.
+
+    The one- and two-part forms are plain f-string comprehensions, several
+    times faster than a join (or numpy.char) per id.
+    """
+    if len(parts) == 1:
+        return [f"{prefix}:{a}" for a in parts[0]]
+    if len(parts) == 2:
+        return [f"{prefix}:{a}:{b}" for a, b in zip(*parts)]
+    return [":".join([prefix, *map(str, values)]) for values in zip(*parts)]
+
+
+# ============================================================================
+# GRAPHML EXPORT
+# ============================================================================
+# Streams the same document nx.write_graphml produces for a graph whose
+# attributes are all strings, without copying and converting the graph first
+
+GRAPHML_HEADER = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+    'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n'
+)
+
+
+def _xml_text(value):
+    """Escape element text."""
+    if "&" in value or "<" in value or ">" in value:
+        value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return value
+
+
+def _xml_attr(value):
+    """Escape an attribute value."""
+    value = _xml_text(value)
+    if '"' in value or "\r" in value or "\n" in value or "\t" in value:
+        value = (value.replace('"', "&quot;").replace("\r", "&#13;")
+                 .replace("\n", "&#10;").replace("\t", "&#09;"))
+    return value
+
+
+def _xml_data(key_ids, data):
+    """<data> lines for an attribute dict, values written as strings."""
+    lines = []
+    for key, value in data.items():
+        text = _xml_text(str(value))
+        key_id = key_ids[str(key)]
+        if text:
+            lines.append(f'      <data key="{key_id}">{text}</data>\n')
+        else:
+            lines.append(f'      <data key="{key_id}" />\n')
+    return "".join(lines)
+
+
+def write_graphml(graph, filepath):
+    """Write a graph as GraphML with every attribute value stored as a string."""
+    node_keys, edge_keys = {}, {}
+    for _, data in graph.nodes(data=True):
+        for key in data:
+            node_keys.setdefault(str(key), None)
+    for _, _, data in graph.edges(data=True):
+        for key in data:
+            edge_keys.setdefault(str(key), None)
+    # Key ids are numbered in first-seen order, node keys before edge keys
+    node_ids = {key: f"d{i}" for i, key in enumerate(node_keys)}
+    edge_ids = {key: f"d{i}" for i, key in enumerate(edge_keys, len(node_ids))}
+    edgedefault = "directed" if graph.is_directed() else "undirected"
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(GRAPHML_HEADER)
+        keys = [("node", name, key_id) for name, key_id in node_ids.items()]
+        keys += [("edge", name, key_id) for name, key_id in edge_ids.items()]
+        for scope, name, key_id in reversed(keys):
+            f.write(f'  <key id="{key_id}" for="{scope}" '
+                    f'attr.name="{_xml_attr(name)}" attr.type="string" />\n')
+        if graph.number_of_nodes() == 0 and graph.number_of_edges() == 0:
+            f.write(f'  <graph edgedefault="{edgedefault}" />\n</graphml>\n')
+            return
+        f.write(f'  <graph edgedefault="{edgedefault}">\n')
+        for node, data in graph.nodes(data=True):
+            node_tag = f'    <node id="{_xml_attr(str(node))}"'
+            if data:
+                f.write(f'{node_tag}>\n{_xml_data(node_ids, data)}    </node>\n')
+            else:
+                f.write(f'{node_tag} />\n')
+        for u, v, data in graph.edges(data=True):
+            edge_tag = f'    <edge source="{_xml_attr(str(u))}" target="{_xml_attr(str(v))}"'
+            if data:
+                f.write(f'{edge_tag}>\n{_xml_data(edge_ids, data)}    </edge>\n')
+            else:
+                f.write(f'{edge_tag} />\n')
+        f.write('  </graph>\n</graphml>\n')
+
+
 # ============================================================================
 # KNOWLEDGE GRAPH BUILDER
 # ============================================================================
@@ -81,128 +217,206 @@ class ClinicalTrialKnowledgeGraph:
         self.node_counts = defaultdict(int)
         self.edge_counts = defaultdict(int)
         self.statistics = {}
+        self._adjacency = None
+        self._pending_nodes = None
+        self._pending_edges = None
+        # Inverted indexes kept up to date on insert: node ids by node_type
+        # (insertion-ordered dicts used as sets) and high-risk node ids
+        self._by_type = defaultdict(dict)
+        self._high_risk = {}
+        # Subject country and risk columns, kept by build_from_data for the
+        # per-country risk distribution
+        self._subject_risk = None
+        # Study ids by descending subject_count, rebuilt after nodes are added
+        self._studies_by_size = None
 
     def add_node(self, node_id, node_type, **properties):
-        self.graph.add_node(node_id, node_type=node_type, **properties)
+        self._insert_nodes([(node_id, {'node_type': node_type, **properties})])
         self.node_counts[node_type] += 1
 
     def add_edge(self, source, target, edge_type, **properties):
-        self.graph.add_edge(source, target, edge_type=edge_type, **properties)
+        self._insert_edges([(source, target, {'edge_type': edge_type, **properties})])
         self.edge_counts[edge_type] += 1
 
+    def add_nodes(self, node_type, node_ids, **properties):
+        """Add one node per id; each property is a sequence aligned with node_ids."""
+        names = list(properties)
+        rows = zip(*properties.values()) if properties else ((),) * len(node_ids)
+        self._insert_nodes([
+            (node_id, {'node_type': node_type, **dict(zip(names, values))})
+            for node_id, values in zip(node_ids, rows)
+        ])
+        self.node_counts[node_type] += len(node_ids)
+
+    def add_edges(self, sources, targets, edge_type):
+        """Add one edge per (source, target) pair."""
+        self._insert_edges([(source, target, {'edge_type': edge_type}) for source, target in zip(sources, targets)])
+        self.edge_counts[edge_type] += len(sources)
+
+    def _insert_nodes(self, nodes):
+        if self._pending_nodes is not None:
+            self._pending_nodes.extend(nodes)
+        else:
+            self.graph.add_nodes_from(nodes)
+            self._adjacency = None
+            self._studies_by_size = None
+            self._index_nodes(node_id for node_id, _ in nodes)
+
+    def _insert_edges(self, edges):
+        if self._pending_edges is not None:
+            self._pending_edges.extend(edges)
+        else:
+            self.graph.add_edges_from(edges)
+            self._adjacency = None
+
+    def _index_nodes(self, node_ids):
+        """Update the type and high-risk indexes from the nodes' stored attributes."""
+        for node_id in node_ids:
+            data = self.graph.nodes[node_id]
+            self._by_type[data['node_type']][node_id] = None
+            if data.get('risk_category') == 'High' or data.get('site_risk_category') == 'High':
+                self._high_risk[node_id] = None
+            else:
+                self._high_risk.pop(node_id, None)
+
+    def nodes_of_type(self, node_type):
+        """Ids of all nodes of a type, in insertion order."""
+        return list(self._by_type.get(node_type, ()))
+
+    @contextmanager
+    def bulk_loading(self):
+        """Buffer node and edge additions and insert them in two calls on exit.
+
+        Counts are kept as nodes and edges are added; the graph itself is only
+        touched once by add_nodes_from and once by add_edges_from.
+        """
+        self._pending_nodes, self._pending_edges = [], []
+        try:
+            yield self
+        finally:
+            nodes, edges = self._pending_nodes, self._pending_edges
+            self._pending_nodes = self._pending_edges = None
+            self._insert_nodes(nodes)
+            self._insert_edges(edges)
+
     def build_from_data(self, subject_df, site_df, study_df=None, region_df=None, country_df=None):
-        """Build the knowledge graph from dataframes."""
+        """Build the knowledge graph from dataframes.
+
+        Each step converts its columns to Python lists once and adds all of
+        its nodes and edges in bulk, instead of iterating rows.
+        """
         print("\nBuilding knowledge graph...")
 
-        # Step 1: Add Region nodes
-        print("  Adding Region nodes...")
-        if region_df is not None:
-            for _, row in region_df.iterrows():
-                self.add_node(
-                    f"region:{row['region']}", node_type="Region", name=row['region'],
-                    site_count=int(row['site_count']), subject_count=int(row['subject_count']),
-                    study_count=int(row['study_count']), country_count=int(row['country_count']),
-                    avg_dqi_score=round(float(row['avg_dqi_score']), 4),
-                    max_dqi_score=round(float(row['max_dqi_score']), 4),
-                    high_risk_subjects=int(row['high_risk_subjects']),
-                    high_risk_rate=round(float(row['high_risk_rate']), 4),
-                    region_risk_category=row['region_risk_category']
+        # Nodes and edges from all five steps are inserted together on exit
+        with self.bulk_loading():
+            # Step 1: Add Region nodes
+            print("  Adding Region nodes...")
+            if region_df is not None:
+                regions = _values(region_df['region'])
+                self.add_nodes(
+                    "Region", _node_ids("region", regions), name=regions,
+                    site_count=_ints(region_df['site_count']), subject_count=_ints(region_df['subject_count']),
+                    study_count=_ints(region_df['study_count']), country_count=_ints(region_df['country_count']),
+                    avg_dqi_score=_scores(region_df['avg_dqi_score']),
+                    max_dqi_score=_scores(region_df['max_dqi_score']),
+                    high_risk_subjects=_ints(region_df['high_risk_subjects']),
+                    high_risk_rate=_scores(region_df['high_risk_rate']),
+                    region_risk_category=_values(region_df['region_risk_category'])
                 )
-        else:
-            for region in subject_df['region'].unique():
-                self.add_node(f"region:{region}", node_type="Region", name=region)
-
-        # Step 2: Add Country nodes
-        print("  Adding Country nodes...")
-        if country_df is not None:
-            for _, row in country_df.iterrows():
-                country_id = f"country:{row['country']}"
-                self.add_node(
-                    country_id, node_type="Country", name=row['country'], region=row['region'],
-                    site_count=int(row['site_count']), subject_count=int(row['subject_count']),
-                    study_count=int(row['study_count']),
-                    avg_dqi_score=round(float(row['avg_dqi_score']), 4),
-                    max_dqi_score=round(float(row['max_dqi_score']), 4),
-                    high_risk_subjects=int(row['high_risk_subjects']),
-                    high_risk_rate=round(float(row['high_risk_rate']), 4),
-                    country_risk_category=row['country_risk_category']
+            else:
+                regions = _values(subject_df['region'].unique())
+                self.add_nodes("Region", _node_ids("region", regions), name=regions)
+
+            # Step 2: Add Country nodes
+            print("  Adding Country nodes...")
+            if country_df is not None:
+                countries, regions = _values(country_df['country']), _values(country_df['region'])
+                country_ids = _node_ids("country", countries)
+                self.add_nodes(
+                    "Country", country_ids, name=countries, region=regions,
+                    site_count=_ints(country_df['site_count']), subject_count=_ints(country_df['subject_count']),
+                    study_count=_ints(country_df['study_count']),
+                    avg_dqi_score=_scores(country_df['avg_dqi_score']),
+                    max_dqi_score=_scores(country_df['max_dqi_score']),
+                    high_risk_subjects=_ints(country_df['high_risk_subjects']),
+                    high_risk_rate=_scores(country_df['high_risk_rate']),
+                    country_risk_category=_values(country_df['country_risk_category'])
                 )
-                self.add_edge(country_id, f"region:{row['region']}", edge_type="IN_REGION")
-        else:
-            country_region = subject_df[['country', 'region']].drop_duplicates()
-            for _, row in country_region.iterrows():
-                country_id = f"country:{row['country']}"
-                self.add_node(country_id, node_type="Country", name=row['country'], region=row['region'])
-                self.add_edge(country_id, f"region:{row['region']}", edge_type="IN_REGION")
-
-        # Step 3: Add Study nodes
-        print("  Adding Study nodes...")
-        if study_df is not None:
-            for _, row in study_df.iterrows():
-                self.add_node(
-                    f"study:{row['study']}", node_type="Study", name=row['study'],
-                    subject_count=int(row['subject_count']), site_count=int(row['site_count']),
-                    avg_dqi_score=round(float(row['avg_dqi_score']), 4),
-                    max_site_dqi_score=round(float(row['max_site_dqi_score']), 4),
-                    high_risk_subjects=int(row['high_risk_subjects']),
-                    high_risk_rate=round(float(row['high_risk_rate']), 4),
-                    high_risk_sites=int(row['high_risk_sites']),
-                    subjects_with_issues=int(row['subjects_with_issues']),
-                    study_risk_category=row['study_risk_category']
+            else:
+                country_region = subject_df[['country', 'region']].drop_duplicates()
+                countries, regions = _values(country_region['country']), _values(country_region['region'])
+                country_ids = _node_ids("country", countries)
+                self.add_nodes("Country", country_ids, name=countries, region=regions)
+            self.add_edges(country_ids, _node_ids("region", regions), edge_type="IN_REGION")
+
+            # Step 3: Add Study nodes
+            print("  Adding Study nodes...")
+            if study_df is not None:
+                studies = _values(study_df['study'])
+                self.add_nodes(
+                    "Study", _node_ids("study", studies), name=studies,
+                    subject_count=_ints(study_df['subject_count']), site_count=_ints(study_df['site_count']),
+                    avg_dqi_score=_scores(study_df['avg_dqi_score']),
+                    max_site_dqi_score=_scores(study_df['max_site_dqi_score']),
+                    high_risk_subjects=_ints(study_df['high_risk_subjects']),
+                    high_risk_rate=_scores(study_df['high_risk_rate']),
+                    high_risk_sites=_ints(study_df['high_risk_sites']),
+                    subjects_with_issues=_ints(study_df['subjects_with_issues']),
+                    study_risk_category=_values(study_df['study_risk_category'])
                 )
-        else:
-            study_metrics = subject_df.groupby('study').agg({
-                'subject_id': 'count', 'dqi_score': ['mean', 'max'],
-                'risk_category': lambda x: (x == 'High').sum(), 'has_issues': 'sum'
-            }).reset_index()
-            study_metrics.columns = ['study', 'subject_count', 'avg_dqi', 'max_dqi', 'high_risk_count', 'subjects_with_issues']
-            site_counts = site_df.groupby('study').size().reset_index(name='site_count')
-            study_metrics = study_metrics.merge(site_counts, on='study', how='left')
-            for _, row in study_metrics.iterrows():
-                self.add_node(
-                    f"study:{row['study']}", node_type="Study", name=row['study'],
-                    subject_count=int(row['subject_count']), site_count=int(row['site_count']),
-                    avg_dqi_score=round(float(row['avg_dqi']), 4),
-                    max_dqi_score=round(float(row['max_dqi']), 4),
-                    high_risk_count=int(row['high_risk_count']),
-                    subjects_with_issues=int(row['subjects_with_issues'])
+            else:
+                # Named aggregations only, so every reduction stays on the Cython path
+                study_metrics = subject_df[['study', 'subject_id', 'dqi_score', 'has_issues']].assign(
+                    is_high=(subject_df['risk_category'] == 'High').astype('int8')
+                ).groupby('study').agg(
+                    subject_count=('subject_id', 'count'), avg_dqi=('dqi_score', 'mean'), max_dqi=('dqi_score', 'max'),
+                    high_risk_count=('is_high', 'sum'), subjects_with_issues=('has_issues', 'sum')
+                ).reset_index()
+                study_metrics['site_count'] = study_metrics['study'].map(site_df.groupby('study').size())
+                studies = _values(study_metrics['study'])
+                self.add_nodes(
+                    "Study", _node_ids("study", studies), name=studies,
+                    subject_count=_ints(study_metrics['subject_count']), site_count=_ints(study_metrics['site_count']),
+                    avg_dqi_score=_scores(study_metrics['avg_dqi']),
+                    max_dqi_score=_scores(study_metrics['max_dqi']),
+                    high_risk_count=_ints(study_metrics['high_risk_count']),
+                    subjects_with_issues=_ints(study_metrics['subjects_with_issues'])
                 )
 
-        # Step 4: Add Site nodes
-        print("  Adding Site nodes...")
-        for _, row in site_df.iterrows():
-            site_id = f"site:{row['study']}:{row['site_id']}"
-            self.add_node(
-                site_id, node_type="Site", name=row['site_id'], study=row['study'],
-                country=row['country'], region=row['region'],
-                subject_count=int(row['subject_count']),
-                avg_dqi_score=round(float(row['avg_dqi_score']), 4),
-                max_dqi_score=round(float(row['max_dqi_score']), 4),
-                high_risk_count=int(row['high_risk_count']),
-                medium_risk_count=int(row['medium_risk_count']),
-                site_risk_category=row['site_risk_category'],
-                subjects_with_issues=int(row['subjects_with_issues'])
+            # Step 4: Add Site nodes
+            print("  Adding Site nodes...")
+            studies, sites = _values(site_df['study']), _values(site_df['site_id'])
+            countries = _values(site_df['country'])
+            site_ids = _node_ids("site", studies, sites)
+            self.add_nodes(
+                "Site", site_ids, name=sites, study=studies,
+                country=countries, region=_values(site_df['region']),
+                subject_count=_ints(site_df['subject_count']),
+                avg_dqi_score=_scores(site_df['avg_dqi_score']),
+                max_dqi_score=_scores(site_df['max_dqi_score']),
+                high_risk_count=_ints(site_df['high_risk_count']),
+                medium_risk_count=_ints(site_df['medium_risk_count']),
+                site_risk_category=_values(site_df['site_risk_category']),
+                subjects_with_issues=_ints(site_df['subjects_with_issues'])
             )
-            self.add_edge(site_id, f"study:{row['study']}", edge_type="PARTICIPATES_IN")
-            self.add_edge(site_id, f"country:{row['country']}", edge_type="LOCATED_IN")
-
-        # Step 5: Add Subject nodes
-        print("  Adding Subject nodes...")
-        subject_cols = ['subject_id', 'study', 'site_id', 'country', 'region', 'subject_status',
-                        'dqi_score', 'risk_category', 'n_issue_types', 'has_issues',
-                        'sae_pending_count', 'missing_visit_count', 'missing_pages_count', 'lab_issues_count']
-        for _, row in subject_df[subject_cols].iterrows():
-            subject_node_id = f"subject:{row['study']}:{row['subject_id']}"
-            site_node_id = f"site:{row['study']}:{row['site_id']}"
-            self.add_node(
-                subject_node_id, node_type="Subject", name=row['subject_id'],
-                study=row['study'], site_id=row['site_id'], status=row['subject_status'],
-                dqi_score=round(float(row['dqi_score']), 4), risk_category=row['risk_category'],
-                n_issue_types=int(row['n_issue_types']), has_issues=int(row['has_issues']),
-                sae_pending=int(row['sae_pending_count']), missing_visits=int(row['missing_visit_count']),
-                missing_pages=int(row['missing_pages_count']), lab_issues=int(row['lab_issues_count'])
+            self.add_edges(site_ids, _node_ids("study", studies), edge_type="PARTICIPATES_IN")
+            self.add_edges(site_ids, _node_ids("country", countries), edge_type="LOCATED_IN")
+
+            # Step 5: Add Subject nodes
+            print("  Adding Subject nodes...")
+            studies, subjects = _values(subject_df['study']), _values(subject_df['subject_id'])
+            sites = _values(subject_df['site_id'])
+            subject_node_ids = _node_ids("subject", studies, subjects)
+            self.add_nodes(
+                "Subject", subject_node_ids, name=subjects,
+                study=studies, site_id=sites, status=_values(subject_df['subject_status']),
+                dqi_score=_scores(subject_df['dqi_score']), risk_category=_values(subject_df['risk_category']),
+                n_issue_types=_ints(subject_df['n_issue_types']), has_issues=_ints(subject_df['has_issues']),
+                sae_pending=_ints(subject_df['sae_pending_count']),
+                missing_visits=_ints(subject_df['missing_visit_count']),
+                missing_pages=_ints(subject_df['missing_pages_count']), lab_issues=_ints(subject_df['lab_issues_count'])
             )
-            self.add_edge(subject_node_id, site_node_id, edge_type="ENROLLED_AT")
+            self.add_edges(subject_node_ids, _node_ids("site", studies, sites), edge_type="ENROLLED_AT")
 
         # Calculate statistics
         self.statistics = {
@@ -216,95 +430,153 @@ class ClinicalTrialKnowledgeGraph:
             'countries': len(country_df) if country_df is not None else subject_df['country'].nunique(),
             'regions': len(region_df) if region_df is not None else subject_df['region'].nunique()
         }
+        self._subject_risk = subject_df[['country', 'risk_category']].copy()
         print(f"  Total nodes: {self.statistics['total_nodes']:,}")
         print(f"  Total edges: {self.statistics['total_edges']:,}")
 
+    def adjacency(self):
+        """Return (nodes, index, A): the node list, node -> row map and CSR adjacency.
+
+        A[i, j] = 1 for an edge nodes[i] -> nodes[j]. Built once from integer
+        edge arrays and cached until the graph changes, so traversals become
+        sparse products instead of per-node successor/predecessor calls.
+        """
+        if self._adjacency is None:
+            nodes = list(self.graph)
+            index = {node: i for i, node in enumerate(nodes)}
+            n_edges = self.graph.number_of_edges()
+            sources = np.fromiter((index[u] for u, _ in self.graph.edges()), dtype=np.int64, count=n_edges)
+            targets = np.fromiter((index[v] for _, v in self.graph.edges()), dtype=np.int64, count=n_edges)
+            A = sparse.csr_matrix((np.ones(n_edges, dtype=np.int32), (sources, targets)),
+                                  shape=(len(nodes), len(nodes)))
+            self._adjacency = (nodes, index, A)
+        return self._adjacency
+
+    def _indicator(self, nodes):
+        """0/1 vector over the adjacency rows marking the given nodes."""
+        all_nodes, index, _ = self.adjacency()
+        vector = np.zeros(len(all_nodes), dtype=np.int32)
+        vector[[index[n] for n in nodes]] = 1
+        return vector
+
+    def _node_set(self, mask):
+        """Node ids for the rows set in a boolean mask."""
+        nodes = self.adjacency()[0]
+        return {nodes[i] for i in np.flatnonzero(mask)}
+
+    def _neighborhood(self, seed_nodes):
+        """Seed nodes plus their direct successors and predecessors."""
+        A = self.adjacency()[2]
+        seed = self._indicator(seed_nodes)
+        return self._node_set((seed > 0) | (A @ seed > 0) | (A.T @ seed > 0))
+
     def get_high_risk_subgraph(self):
         """Extract subgraph containing only high-risk entities."""
-        high_risk_nodes = [n for n, d in self.graph.nodes(data=True)
-                          if d.get('risk_category') == 'High' or d.get('site_risk_category') == 'High']
-        extended_nodes = set(high_risk_nodes)
-        for node in high_risk_nodes:
-            extended_nodes.update(self.graph.successors(node))
-            extended_nodes.update(self.graph.predecessors(node))
-        return self.graph.subgraph(extended_nodes).copy()
+        return self.graph.subgraph(self._neighborhood(self._high_risk)).copy()
 
     def get_top_studies_subgraph(self, top_n=5):
         """Extract subgraph for top N studies by subject count."""
-        study_nodes = [(n, d) for n, d in self.graph.nodes(data=True) if d.get('node_type') == 'Study']
-        top_studies = sorted(study_nodes, key=lambda x: x[1].get('subject_count', 0), reverse=True)[:top_n]
-        top_study_ids = {node[0] for node in top_studies}
-        included_nodes = set(top_study_ids)
-        for study_node in top_study_ids:
-            included_nodes.update(self.graph.predecessors(study_node))
-            for site_node in self.graph.predecessors(study_node):
-                included_nodes.update(self.graph.predecessors(site_node))
-                included_nodes.update(self.graph.successors(site_node))
-        return self.graph.subgraph(included_nodes).copy()
+        if self._studies_by_size is None:
+            self._studies_by_size = sorted(self._by_type['Study'], reverse=True,
+                                           key=lambda n: self.graph.nodes[n].get('subject_count', 0))
+        top_study_ids = set(self._studies_by_size[:top_n])
+        A = self.adjacency()[2]
+        seed = self._indicator(top_study_ids)
+        # Predecessors of the studies (sites), then both neighbours of those sites
+        sites = (A @ seed > 0).astype(np.int32)
+        reached = (seed > 0) | (sites > 0) | (A @ sites > 0) | (A.T @ sites > 0)
+        return self.graph.subgraph(self._node_set(reached)).copy()
 
     def get_sample_subgraph(self, sample_size=1000):
         """Extract random sample subgraph."""
-        subject_nodes = [n for n, d in self.graph.nodes(data=True) if d.get('node_type') == 'Subject']
-        sample_subjects = np.random.choice(subject_nodes, min(sample_size, len(subject_nodes)), replace=False)
-        included_nodes = set(sample_subjects)
-        for subject_node in sample_subjects:
-            included_nodes.update(self.graph.successors(subject_node))
-            for connected_node in self.graph.successors(subject_node):
-                included_nodes.update(self.graph.successors(connected_node))
-        return self.graph.subgraph(included_nodes).copy()
+        subject_nodes = self.nodes_of_type('Subject')
+        # Sample positions rather than an object array of ids; same draws for a given seed
+        picks = np.random.choice(len(subject_nodes), min(sample_size, len(subject_nodes)), replace=False)
+        sample_subjects = [subject_nodes[i] for i in picks]
+        A = self.adjacency()[2]
+        seed = self._indicator(sample_subjects)
+        # Successors of the sampled subjects, then successors of those
+        one_hop = (A.T @ seed > 0).astype(np.int32)
+        reached = (seed > 0) | (one_hop > 0) | (A.T @ one_hop > 0)
+        return self.graph.subgraph(self._node_set(reached)).copy()
 
     def export_graphml(self, filepath):
         """Export graph to GraphML format."""
-        G = self.graph.copy()
-        for node in G.nodes():
-            for key, value in G.nodes[node].items():
-                G.nodes[node][key] = str(value)
-        for u, v in G.edges():
-            for key, value in G.edges[u, v].items():
-                G.edges[u, v][key] = str(value)
-        nx.write_graphml(G, filepath)
+        write_graphml(self.graph, filepath)
 
     def export_subgraph_graphml(self, subgraph, filepath):
         """Export a subgraph to GraphML format."""
-        G = subgraph.copy()
-        for node in G.nodes():
-            for key, value in G.nodes[node].items():
-                G.nodes[node][key] = str(value)
-        for u, v in G.edges():
-            for key, value in G.edges[u, v].items():
-                G.edges[u, v][key] = str(value)
-        nx.write_graphml(G, filepath)
+        write_graphml(subgraph, filepath)
 
-    def export_neo4j_csv(self, nodes_path, edges_path):
-        """Export to CSV format for Neo4j import."""
+    def _export_tables(self):
+        """Node and edge tables with one column per attribute, as used by the tabular exports."""
         nodes_data = [{'node_id': node_id, **data} for node_id, data in self.graph.nodes(data=True)]
-        pd.DataFrame(nodes_data).to_csv(nodes_path, index=False)
         edges_data = [{'source': s, 'target': t, **data} for s, t, data in self.graph.edges(data=True)]
-        pd.DataFrame(edges_data).to_csv(edges_path, index=False)
+        return pd.DataFrame(nodes_data), pd.DataFrame(edges_data)
+
+    def export_neo4j_csv(self, nodes_path, edges_path):
+        """Export to CSV format for Neo4j import.
+
+        Uses the pandas writer: pyarrow is an optional extra, so its CSV
+        writer cannot be relied on for this default output.
+        """
+        nodes_df, edges_df = self._export_tables()
+        nodes_df.to_csv(nodes_path, index=False)
+        edges_df.to_csv(edges_path, index=False)
+
+    def export_parquet(self, nodes_path, edges_path):
+        """Export the Neo4j node and edge tables as zstd Parquet (requires pyarrow)."""
+        nodes_df, edges_df = self._export_tables()
+        nodes_df.to_parquet(nodes_path, engine='pyarrow', compression='zstd', index=False)
+        edges_df.to_parquet(edges_path, engine='pyarrow', compression='zstd', index=False)
 
     def export_summary_json(self, filepath):
         """Export summary statistics to JSON."""
         summary = {'statistics': self.statistics, 'risk_by_country': self.get_risk_distribution_by_country()}
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(summary, f, indent=2)
+        # dumps encodes in one pass; json.dump writes every indented fragment separately
+        Path(filepath).write_text(json.dumps(summary, indent=2), encoding='utf-8')
 
     def get_risk_distribution_by_country(self):
-        """Get risk distribution grouped by country."""
-        distribution = defaultdict(lambda: {'High': 0, 'Medium': 0, 'Low': 0, 'total': 0})
-        for node, data in self.graph.nodes(data=True):
-            if data.get('node_type') == 'Subject':
-                country = data.get('country', 'Unknown')
-                risk = data.get('risk_category', 'Unknown')
-                if risk in distribution[country]:
-                    distribution[country][risk] += 1
-                distribution[country]['total'] += 1
-        return dict(distribution)
+        """Get risk distribution grouped by country.
+
+        Counted with one crosstab over the subject table; subjects without a
+        known country are grouped under 'Unknown'.
+        """
+        subjects = self._subject_risk
+        if subjects is None:
+            data = [self.graph.nodes[n] for n in self._by_type['Subject']]
+            subjects = pd.DataFrame({'country': [d.get('country') for d in data],
+                                     'risk_category': [d.get('risk_category') for d in data]})
+        country = subjects['country'].fillna('Unknown')
+        totals = country.value_counts().sort_index()
+        table = pd.crosstab(country, subjects['risk_category']).reindex(
+            index=totals.index, columns=['High', 'Medium', 'Low'], fill_value=0)
+        table['total'] = totals
+        return table.to_dict(orient='index')
 
 
 # ============================================================================
 # MAIN FUNCTION
 # ============================================================================
 
+def print_sample_queries(study_df, region_df):
+    """Print the top studies by high-risk subjects and the per-region risk summary."""
+    print("\n" + "=" * 70)
+    print("STEP 3: SAMPLE QUERIES")
+    print("=" * 70)
+    print("\nHigh-risk subjects by study:")
+    if study_df is not None:
+        top_studies = study_df.nlargest(5, 'high_risk_subjects')[['study', 'high_risk_subjects', 'study_risk_category']]
+        for row in top_studies.itertuples(index=False):
+            print(f"  {row.study}: {int(row.high_risk_subjects):,} high-risk [{row.study_risk_category}]")
+
+    print("\nRisk summary by region:")
+    if region_df is not None:
+        for row in region_df.itertuples(index=False):
+            print(f"  {row.region}: {int(row.site_count)} sites, DQI={row.avg_dqi_score:.4f}, "
+                  f"High-risk={row.high_risk_rate*100:.1f}% [{row.region_risk_category}]")
+
+
 def build_knowledge_graph(args):
     """Main function to build and export the knowledge graph."""
     print("=" * 70)
@@ -324,8 +596,8 @@ def build_knowledge_graph(args):
         return False
 
     print(f"\nLoading data...")
-    subject_df = pd.read_csv(SUBJECT_PATH)
-    site_df = pd.read_csv(SITE_PATH)
+    subject_df = pd.read_csv(SUBJECT_PATH, usecols=SUBJECT_COLUMNS)
+    site_df = pd.read_csv(SITE_PATH, usecols=SITE_COLUMNS)
 
     study_df = pd.read_csv(STUDY_PATH) if STUDY_PATH.exists() else None
     region_df = pd.read_csv(REGION_PATH) if REGION_PATH.exists() else None
@@ -340,6 +612,11 @@ def build_knowledge_graph(args):
     if country_df is not None:
         print(f"  Countries: {len(country_df)}")
 
+    # The sample queries only read the phase 03 tables, so they need no graph
+    if args.queries_only:
+        print_sample_queries(study_df, region_df)
+        return True
+
     # Build Knowledge Graph
     print("\n" + "=" * 70)
     print("STEP 1: BUILD KNOWLEDGE GRAPH")
@@ -359,20 +636,7 @@ def build_knowledge_graph(args):
         print(f"  {edge_type}: {count:,}")
 
     # Sample Queries
-    print("\n" + "=" * 70)
-    print("STEP 3: SAMPLE QUERIES")
-    print("=" * 70)
-    print("\nHigh-risk subjects by study:")
-    if study_df is not None:
-        top_studies = study_df.nlargest(5, 'high_risk_subjects')[['study', 'high_risk_subjects', 'study_risk_category']]
-        for _, row in top_studies.iterrows():
-            print(f"  {row['study']}: {int(row['high_risk_subjects']):,} high-risk [{row['study_risk_category']}]")
-
-    print("\nRisk summary by region:")
-    if region_df is not None:
-        for _, row in region_df.iterrows():
-            print(f"  {row['region']}: {int(row['site_count'])} sites, DQI={row['avg_dqi_score']:.4f}, "
-                  f"High-risk={row['high_risk_rate']*100:.1f}% [{row['region_risk_category']}]")
+    print_sample_queries(study_df, region_df)
 
     # Export Full Graph
     if not args.high_risk_only:
@@ -394,6 +658,15 @@ def build_knowledge_graph(args):
         print(f"  [OK] Saved: {nodes_path}")
         print(f"  [OK] Saved: {edges_path}")
 
+        if args.parquet:
+            print(f"\nExporting Parquet tables...")
+            try:
+                kg.export_parquet(nodes_path.with_suffix('.parquet'), edges_path.with_suffix('.parquet'))
+                print(f"  [OK] Saved: {nodes_path.with_suffix('.parquet')}")
+                print(f"  [OK] Saved: {edges_path.with_suffix('.parquet')}")
+            except ImportError:
+                print(f"  [WARN] pyarrow not available, skipping Parquet export")
+
         summary_path = PHASE_DIRS['phase_04']/ "knowledge_graph_summary.json"
         print(f"\nExporting summary JSON...")
         kg.export_summary_json(summary_path)
@@ -441,31 +714,32 @@ def build_knowledge_graph(args):
         print("STEP 6: GENERATE REPORT")
         print("=" * 70)
         report_path = PHASE_DIRS['phase_04']/ "knowledge_graph_report.txt"
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write("JAVELIN.AI - KNOWLEDGE GRAPH REPORT\n")
-            f.write("=" * 60 + "\n\n")
-            f.write("GRAPH STRUCTURE\n" + "-" * 40 + "\n")
-            f.write(f"Total Nodes: {kg.statistics['total_nodes']:,}\n")
-            f.write(f"Total Edges: {kg.statistics['total_edges']:,}\n\n")
-            f.write("NODE TYPES\n" + "-" * 40 + "\n")
-            for node_type, count in sorted(kg.node_counts.items()):
-                f.write(f"  {node_type}: {count:,}\n")
-            f.write("\nEDGE TYPES\n" + "-" * 40 + "\n")
-            for edge_type, count in sorted(kg.edge_counts.items()):
-                f.write(f"  {edge_type}: {count:,}\n")
-            f.write("\nHIERARCHY\n" + "-" * 40 + "\n")
-            f.write(f"Region ({kg.node_counts.get('Region', 0)})\n")
-            f.write(f"  -> Country ({kg.node_counts.get('Country', 0)})\n")
-            f.write(f"       -> Site ({kg.node_counts.get('Site', 0):,})\n")
-            f.write(f"            -> Subject ({kg.node_counts.get('Subject', 0):,})\n")
-            f.write(f"Study ({kg.node_counts.get('Study', 0)})\n")
-            f.write(f"  -> Site ({kg.node_counts.get('Site', 0):,})\n")
-            f.write(f"       -> Subject ({kg.node_counts.get('Subject', 0):,})\n\n")
-            if region_df is not None:
-                f.write("RISK DISTRIBUTION BY REGION\n" + "-" * 40 + "\n")
-                for _, row in region_df.iterrows():
-                    f.write(f"{row['region']}: {int(row['high_risk_subjects']):,} high-risk / "
-                            f"{int(row['subject_count']):,} total ({row['high_risk_rate']*100:.1f}%) [{row['region_risk_category']}]\n")
+        parts = []
+        parts.append("JAVELIN.AI - KNOWLEDGE GRAPH REPORT\n")
+        parts.append("=" * 60 + "\n\n")
+        parts.append("GRAPH STRUCTURE\n" + "-" * 40 + "\n")
+        parts.append(f"Total Nodes: {kg.statistics['total_nodes']:,}\n")
+        parts.append(f"Total Edges: {kg.statistics['total_edges']:,}\n\n")
+        parts.append("NODE TYPES\n" + "-" * 40 + "\n")
+        for node_type, count in sorted(kg.node_counts.items()):
+            parts.append(f"  {node_type}: {count:,}\n")
+        parts.append("\nEDGE TYPES\n" + "-" * 40 + "\n")
+        for edge_type, count in sorted(kg.edge_counts.items()):
+            parts.append(f"  {edge_type}: {count:,}\n")
+        parts.append("\nHIERARCHY\n" + "-" * 40 + "\n")
+        parts.append(f"Region ({kg.node_counts.get('Region', 0)})\n")
+        parts.append(f"  -> Country ({kg.node_counts.get('Country', 0)})\n")
+        parts.append(f"       -> Site ({kg.node_counts.get('Site', 0):,})\n")
+        parts.append(f"            -> Subject ({kg.node_counts.get('Subject', 0):,})\n")
+        parts.append(f"Study ({kg.node_counts.get('Study', 0)})\n")
+        parts.append(f"  -> Site ({kg.node_counts.get('Site', 0):,})\n")
+        parts.append(f"       -> Subject ({kg.node_counts.get('Subject', 0):,})\n\n")
+        if region_df is not None:
+            parts.append("RISK DISTRIBUTION BY REGION\n" + "-" * 40 + "\n")
+            for row in region_df.itertuples(index=False):
+                parts.append(f"{row.region}: {int(row.high_risk_subjects):,} high-risk / "
+                             f"{int(row.subject_count):,} total ({row.high_risk_rate*100:.1f}%) [{row.region_risk_category}]\n")
+        report_path.write_text("".join(parts), encoding='utf-8')
         print(f"  [OK] Saved: {report_path}")
 
     # Summary
@@ -515,6 +789,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Build clinical trial knowledge graph')
     parser.add_argument('--subgraphs', type=str, help='Comma-separated: high_risk, top_studies, sample, or "all"')
     parser.add_argument('--high-risk-only', action='store_true', help='Create ONLY the high-risk subgraph')
+    parser.add_argument('--queries-only', action='store_true',
+                        help='Print the sample queries from the phase 03 tables without building the graph')
+    parser.add_argument('--parquet', action='store_true',
+                        help='Also export the node and edge tables as zstd Parquet (requires pyarrow)')
     args = parser.parse_args()
 
     success = build_knowledge_graph(args)
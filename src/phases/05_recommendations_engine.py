@@ -37,7 +37,7 @@ import json
 import requests
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -144,6 +144,31 @@ ISSUE_ACTIONS = {
     }
 }
 
+# Subject columns read by this phase (identifiers, score, risk and the issue
+# counts in ISSUE_ACTIONS); the DQI component columns are not loaded
+SUBJECT_COLUMNS = {'study', 'subject_id', 'site_id', 'country', 'dqi_score', 'risk_category', *ISSUE_ACTIONS}
+
+# Site-level issue totals (phase 03 '<issue>_sum' columns) scanned for site issues
+SITE_ISSUE_COLUMNS = [
+    'sae_pending_count_sum', 'uncoded_meddra_count_sum',
+    'missing_visit_count_sum', 'missing_pages_count_sum',
+    'lab_issues_count_sum', 'uncoded_whodd_count_sum',
+    'edrr_open_issues_sum', 'inactivated_forms_count_sum'
+]
+
+# Values used for site columns that are absent from the phase 03 site table
+SITE_DEFAULTS = {
+    'country': 'Unknown', 'region': 'Unknown', 'high_risk_count': 0, 'subjects_with_issues': 0,
+    'avg_issue_types': 0, 'max_days_outstanding_sum': 0, 'missing_visit_count_sum': 0,
+    'sae_pending_count_sum': 0
+}
+
+# Sort rank of each recommendation priority (unknown priorities sort last)
+PRIORITY_ORDER = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
+
+# Issue types from most to least urgent; subject issue lists follow this order
+ISSUES_BY_PRIORITY = sorted(ISSUE_ACTIONS, key=lambda t: PRIORITY_ORDER.get(ISSUE_ACTIONS[t]['priority'], 4))
+
 
 # ============================================================================
 # OLLAMA LLM INTEGRATION
@@ -300,12 +325,24 @@ Provide a specific assessment and one key action item."""
 # DATA LOADING
 # ============================================================================
 
-def load_data() -> Dict[str, pd.DataFrame]:
-    """Load all required data files."""
+def _sae_pending_total(subjects_df: pd.DataFrame) -> int:
+    """Total pending SAE reviews across all subjects (0 when the column is absent)."""
+    if 'sae_pending_count' not in subjects_df.columns:
+        return 0
+    return int(subjects_df['sae_pending_count'].sum())
+
+
+def load_data() -> Dict[str, Union[pd.DataFrame, int]]:
+    """Load all required data files.
+
+    Besides the tables, the dict holds 'sae_pending_total', the pending SAE
+    count summed over all subjects.
+    """
     data = {}
 
     if SUBJECT_DQI_PATH.exists():
-        data['subjects'] = pd.read_csv(SUBJECT_DQI_PATH)
+        data['subjects'] = pd.read_csv(SUBJECT_DQI_PATH, usecols=lambda c: c in SUBJECT_COLUMNS)
+        data['sae_pending_total'] = _sae_pending_total(data['subjects'])
         print(f"  Loaded {len(data['subjects']):,} subjects")
     else:
         raise FileNotFoundError(f"{SUBJECT_DQI_PATH} not found. Run 03_calculate_dqi.py first.")
@@ -324,49 +361,62 @@ def load_data() -> Dict[str, pd.DataFrame]:
 # RECOMMENDATION GENERATION
 # ============================================================================
 
-def generate_subject_recommendations(df: pd.DataFrame) -> List[Dict]:
-    """Generate recommendations for high-risk subjects."""
-    recommendations = []
-    high_risk = df[df['risk_category'] == 'High'].copy()
+def _with_defaults(df: pd.DataFrame, defaults: Dict[str, Any]) -> pd.DataFrame:
+    """df with every column of `defaults` it lacks added as a constant column."""
+    missing = {col: value for col, value in defaults.items() if col not in df.columns}
+    return df.assign(**missing) if missing else df
 
-    for _, row in high_risk.iterrows():
-        rec = {
-            'level': 'SUBJECT',
-            'study': row['study'],
-            'site_id': row['site_id'],
-            'subject_id': row['subject_id'],
-            'country': row.get('country', 'Unknown'),
-            'dqi_score': round(row['dqi_score'], 3),
-            'risk_category': row['risk_category'],
-            'issues': [],
-            'actions': []
-        }
 
-        for issue_type, config in ISSUE_ACTIONS.items():
-            if issue_type in row and row[issue_type] > 0:
-                rec['issues'].append({
-                    'type': issue_type,
-                    'count': int(row[issue_type]),
-                    'priority': config['priority'],
-                    'action': config['action'],
-                    'owner': config['owner'],
-                    'sla': config['sla']
-                })
-
-        priority_order = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
-        rec['issues'].sort(key=lambda x: priority_order.get(x['priority'], 4))
-
-        if rec['issues']:
-            rec['priority'] = rec['issues'][0]['priority']
-        else:
-            rec['priority'] = 'LOW'
+def _positive_counts(df: pd.DataFrame, columns: List[str]):
+    """(row position, column position, count) triples for the positive values of df[columns].
 
-        recommendations.append(rec)
+    The whole block is compared against zero at once; results come row by row,
+    columns in the order given.
+    """
+    values = df[columns].to_numpy()
+    rows, cols = np.nonzero(values > 0)
+    return zip(rows.tolist(), cols.tolist(), values[rows, cols].astype(np.int64).tolist())
 
-    priority_order = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
-    recommendations.sort(key=lambda x: (priority_order.get(x['priority'], 4), -x['dqi_score']))
 
-    return recommendations
+def generate_subject_recommendations(df: pd.DataFrame) -> List[Dict]:
+    """Generate recommendations for high-risk subjects.
+
+    The issue columns of all high-risk subjects are tested in one array
+    comparison; only the positive counts are turned into issue dicts.
+    """
+    recommendations = []
+    high_risk = _with_defaults(df[df['risk_category'] == 'High'], {'country': 'Unknown'})
+
+    # Issue columns in priority order, so each subject's issues come out sorted
+    issue_types = [t for t in ISSUES_BY_PRIORITY if t in high_risk.columns]
+    issues = [[] for _ in range(len(high_risk))]
+    for row, col, count in _positive_counts(high_risk, issue_types):
+        issue_type = issue_types[col]
+        issues[row].append({'type': issue_type, 'count': count, **ISSUE_ACTIONS[issue_type]})
+
+    for study, site_id, subject_id, country, dqi_score, risk_category, subject_issues in zip(
+            high_risk['study'].tolist(), high_risk['site_id'].tolist(), high_risk['subject_id'].tolist(),
+            high_risk['country'].tolist(), high_risk['dqi_score'].tolist(), high_risk['risk_category'].tolist(),
+            issues):
+        recommendations.append({
+            'level': 'SUBJECT',
+            'study': study,
+            'site_id': site_id,
+            'subject_id': subject_id,
+            'country': country,
+            'dqi_score': round(dqi_score, 3),
+            'risk_category': risk_category,
+            'issues': subject_issues,
+            'actions': [],
+            'priority': subject_issues[0]['priority'] if subject_issues else 'LOW'
+        })
+
+    # Most urgent priority first, then highest DQI; lexsort is stable, like list.sort
+    rank = np.array([PRIORITY_ORDER.get(rec['priority'], 4) for rec in recommendations])
+    dqi = np.array([rec['dqi_score'] for rec in recommendations], dtype=float)
+    order = np.lexsort((-dqi, rank))
+
+    return [recommendations[i] for i in order.tolist()]
 
 
 def generate_site_recommendations(df: pd.DataFrame, llm: Optional[OllamaLLM] = None, top_sites: int = 50) -> List[Dict]:
@@ -379,64 +429,73 @@ def generate_site_recommendations(df: pd.DataFrame, llm: Optional[OllamaLLM] = N
     ].copy()
 
     flagged_sites = flagged_sites.sort_values('avg_dqi_score', ascending=False)
+    # Optional columns are filled once, so every field below is read directly
+    flagged_sites = _with_defaults(flagged_sites, SITE_DEFAULTS)
+
+    # Root-cause and priority tests, evaluated for all flagged sites at once
+    subject_count = flagged_sites['subject_count']
+    is_high_risk = (flagged_sites['site_risk_category'] == 'High').to_numpy()
+    has_pending_sae = (flagged_sites['sae_pending_count_sum'] > 0).to_numpy()
+    many_issue_types = (flagged_sites['avg_issue_types'] > 3).to_numpy()
+    entry_backlog = (flagged_sites['max_days_outstanding_sum'] > 100).to_numpy()
+    missed_visits = (flagged_sites['missing_visit_count_sum'] > 5).to_numpy()
+    many_high_risk = (flagged_sites['high_risk_count'] > subject_count * 0.2).to_numpy()
+    many_with_issues = (flagged_sites['subjects_with_issues'] / subject_count.clip(lower=1) > 0.5).to_numpy()
+
+    # Issue totals of every flagged site, from one comparison over the issue columns
+    issue_columns = [
+        col for col in SITE_ISSUE_COLUMNS
+        if col in flagged_sites.columns and col.replace('_sum', '') in ISSUE_ACTIONS
+    ]
+    site_issues = [[] for _ in range(len(flagged_sites))]
+    for row, col, count in _positive_counts(flagged_sites, issue_columns):
+        issue_type = issue_columns[col].replace('_sum', '')
+        config = ISSUE_ACTIONS[issue_type]
+        site_issues[row].append({
+            'type': issue_type,
+            'total_count': count,
+            'priority': config['priority'],
+            'action': config['action']
+        })
 
-    for idx, (_, row) in enumerate(flagged_sites.iterrows()):
+    for idx, row in enumerate(flagged_sites.itertuples(index=False)):
         rec = {
             'level': 'SITE',
-            'study': row['study'],
-            'site_id': row['site_id'],
-            'country': row.get('country', 'Unknown'),
-            'region': row.get('region', 'Unknown'),
-            'subject_count': int(row['subject_count']),
-            'avg_dqi_score': round(row['avg_dqi_score'], 3),
-            'max_dqi_score': round(row['max_dqi_score'], 3),
-            'high_risk_count': int(row.get('high_risk_count', 0)),
-            'site_risk_category': row['site_risk_category'],
-            'issues': [],
+            'study': row.study,
+            'site_id': row.site_id,
+            'country': row.country,
+            'region': row.region,
+            'subject_count': int(row.subject_count),
+            'avg_dqi_score': round(row.avg_dqi_score, 3),
+            'max_dqi_score': round(row.max_dqi_score, 3),
+            'high_risk_count': int(row.high_risk_count),
+            'site_risk_category': row.site_risk_category,
+            'issues': site_issues[idx],
             'root_causes': [],
             'recommendations': [],
             'ai_insight': None
         }
 
-        issue_columns = [
-            'sae_pending_count_sum', 'uncoded_meddra_count_sum',
-            'missing_visit_count_sum', 'missing_pages_count_sum',
-            'lab_issues_count_sum', 'uncoded_whodd_count_sum',
-            'edrr_open_issues_sum', 'inactivated_forms_count_sum'
-        ]
-
-        for col in issue_columns:
-            if col in row and row[col] > 0:
-                issue_type = col.replace('_sum', '')
-                if issue_type in ISSUE_ACTIONS:
-                    config = ISSUE_ACTIONS[issue_type]
-                    rec['issues'].append({
-                        'type': issue_type,
-                        'total_count': int(row[col]),
-                        'priority': config['priority'],
-                        'action': config['action']
-                    })
-
-        if row.get('avg_issue_types', 0) > 3:
+        if many_issue_types[idx]:
             rec['root_causes'].append("Systemic site quality issues - multiple issue types indicate training gaps")
-        if row.get('max_days_outstanding_sum', 0) > 100:
+        if entry_backlog[idx]:
             rec['root_causes'].append("Data entry backlog - site may be under-resourced")
-        if row.get('missing_visit_count_sum', 0) > 5:
+        if missed_visits[idx]:
             rec['root_causes'].append("Protocol compliance issues - subjects missing scheduled visits")
-        if row.get('sae_pending_count_sum', 0) > 0:
+        if has_pending_sae[idx]:
             rec['root_causes'].append("Safety reporting delays - requires immediate escalation")
 
-        if row['site_risk_category'] == 'High':
+        if is_high_risk[idx]:
             rec['recommendations'].append("Schedule urgent site quality call within 48 hours")
             rec['recommendations'].append("Consider triggered monitoring visit")
-        if row.get('high_risk_count', 0) > row['subject_count'] * 0.2:
+        if many_high_risk[idx]:
             rec['recommendations'].append("Review site training records and re-train if needed")
-        if row.get('subjects_with_issues', 0) / max(row['subject_count'], 1) > 0.5:
+        if many_with_issues[idx]:
             rec['recommendations'].append("Implement enhanced oversight procedures")
 
-        if row.get('sae_pending_count_sum', 0) > 0:
+        if has_pending_sae[idx]:
             rec['priority'] = 'CRITICAL'
-        elif row['site_risk_category'] == 'High':
+        elif is_high_risk[idx]:
             rec['priority'] = 'HIGH'
         else:
             rec['priority'] = 'MEDIUM'
@@ -449,8 +508,7 @@ def generate_site_recommendations(df: pd.DataFrame, llm: Optional[OllamaLLM] = N
 
         recommendations.append(rec)
 
-    priority_order = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
-    recommendations.sort(key=lambda x: (priority_order.get(x['priority'], 4), -x['avg_dqi_score']))
+    recommendations.sort(key=lambda x: (PRIORITY_ORDER.get(x['priority'], 4), -x['avg_dqi_score']))
 
     return recommendations
 
@@ -473,40 +531,44 @@ def generate_study_recommendations(site_df: pd.DataFrame, llm: Optional[OllamaLL
                              'total_high_risk', 'total_sae_pending',
                              'total_missing_visits', 'total_uncoded_meddra']
 
-    for idx, (_, row) in enumerate(study_summary.iterrows()):
+    # Rates and priorities for all studies at once; the loop only assembles records
+    study_summary['high_risk_rate'] = study_summary['total_high_risk'] / study_summary['n_subjects'].clip(lower=1) * 100
+    study_summary['priority'] = np.select(
+        [study_summary['total_sae_pending'] > 0, study_summary['total_high_risk'] > study_summary['n_subjects'] * 0.1],
+        ['CRITICAL', 'HIGH'], 'MEDIUM'
+    ).tolist()
+
+    for idx, row in enumerate(study_summary.itertuples(index=False)):
         rec = {
             'level': 'STUDY',
-            'study': row['study'],
-            'n_sites': int(row['n_sites']),
-            'n_subjects': int(row['n_subjects']),
-            'avg_dqi': round(row['avg_dqi'], 3),
-            'total_high_risk': int(row['total_high_risk']),
+            'study': row.study,
+            'n_sites': int(row.n_sites),
+            'n_subjects': int(row.n_subjects),
+            'avg_dqi': round(row.avg_dqi, 3),
+            'total_high_risk': int(row.total_high_risk),
             'key_metrics': {},
             'recommendations': [],
             'ai_insight': None
         }
 
         rec['key_metrics'] = {
-            'high_risk_rate': round(row['total_high_risk'] / max(row['n_subjects'], 1) * 100, 1),
-            'pending_sae': int(row['total_sae_pending']),
-            'missing_visits': int(row['total_missing_visits']),
-            'uncoded_ae': int(row['total_uncoded_meddra'])
+            'high_risk_rate': round(row.high_risk_rate, 1),
+            'pending_sae': int(row.total_sae_pending),
+            'missing_visits': int(row.total_missing_visits),
+            'uncoded_ae': int(row.total_uncoded_meddra)
         }
 
-        if row['total_sae_pending'] > 0:
-            rec['recommendations'].append(f"URGENT: {int(row['total_sae_pending'])} pending SAE reviews require immediate attention")
-            rec['priority'] = 'CRITICAL'
-        elif row['total_high_risk'] > row['n_subjects'] * 0.1:
+        if row.priority == 'CRITICAL':
+            rec['recommendations'].append(f"URGENT: {int(row.total_sae_pending)} pending SAE reviews require immediate attention")
+        elif row.priority == 'HIGH':
             rec['recommendations'].append(f"High-risk subject rate ({rec['key_metrics']['high_risk_rate']}%) exceeds threshold")
-            rec['priority'] = 'HIGH'
-        else:
-            rec['priority'] = 'MEDIUM'
+        rec['priority'] = row.priority
 
-        if row['total_missing_visits'] > 10:
-            rec['recommendations'].append(f"Address {int(row['total_missing_visits'])} missing visits across sites")
+        if row.total_missing_visits > 10:
+            rec['recommendations'].append(f"Address {int(row.total_missing_visits)} missing visits across sites")
 
-        if row['total_uncoded_meddra'] > 5:
-            rec['recommendations'].append(f"Clear {int(row['total_uncoded_meddra'])} uncoded adverse event terms")
+        if row.total_uncoded_meddra > 5:
+            rec['recommendations'].append(f"Clear {int(row.total_uncoded_meddra)} uncoded adverse event terms")
 
         if llm and llm.available and idx < 10:
             insight = generate_study_insight(llm, rec)
@@ -721,7 +783,7 @@ def generate_executive_summary(
     subject_recs: List[Dict],
     site_recs: List[Dict],
     study_recs: List[Dict],
-    data: Dict[str, pd.DataFrame],
+    data: Dict[str, Union[pd.DataFrame, int]],
     llm: Optional[OllamaLLM] = None,
     region_recs: List[Dict] = None,
     country_recs: List[Dict] = None
@@ -731,16 +793,19 @@ def generate_executive_summary(
     sites_df = data['sites']
 
     total_subjects = len(subjects_df)
-    high_risk_subjects = len(subjects_df[subjects_df['risk_category'] == 'High'])
-    medium_risk_subjects = len(subjects_df[subjects_df['risk_category'] == 'Medium'])
+    subject_risk_counts = subjects_df['risk_category'].value_counts()
+    high_risk_subjects = int(subject_risk_counts.get('High', 0))
+    medium_risk_subjects = int(subject_risk_counts.get('Medium', 0))
 
     total_sites = len(sites_df)
-    high_risk_sites = len(sites_df[sites_df['site_risk_category'] == 'High'])
+    high_risk_sites = int(sites_df['site_risk_category'].value_counts().get('High', 0))
 
     critical_count = sum(1 for r in subject_recs if r.get('priority') == 'CRITICAL')
     critical_sites = sum(1 for r in site_recs if r.get('priority') == 'CRITICAL')
 
-    pending_sae = int(subjects_df['sae_pending_count'].sum()) if 'sae_pending_count' in subjects_df.columns else 0
+    pending_sae = data.get('sae_pending_total')
+    if pending_sae is None:
+        pending_sae = _sae_pending_total(subjects_df)
 
     all_issues = []
     for rec in subject_recs:
@@ -770,7 +835,7 @@ def generate_executive_summary(
         }
         ai_executive_insight = generate_executive_insight(llm, summary_data)
 
-    summary = f"""
+    parts = [f"""
 ================================================================================
 JAVELIN.AI - DATA QUALITY EXECUTIVE SUMMARY
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -792,129 +857,129 @@ Subject Level:
 Site Level:
   * High Risk Sites: {high_risk_sites} ({high_risk_sites/total_sites*100:.1f}%)
 
-"""
+"""]
 
     if region_recs:
-        summary += """REGIONAL ANALYSIS
+        parts.append("""REGIONAL ANALYSIS
 -----------------
-"""
+""")
         for rec in region_recs:
             status = "⚠️" if rec['priority'] in ['HIGH', 'CRITICAL'] else "✓"
-            summary += f"  {status} {rec['region']}: {rec['n_countries']} countries, {rec['n_sites']} sites, {rec['n_subjects']:,} subjects\n"
-            summary += f"     DQI: {rec['avg_dqi']:.3f} | High-risk rate: {rec['key_metrics']['high_risk_rate']:.1f}%"
-            summary += f" | vs Portfolio: {rec['comparison_to_portfolio']['dqi_vs_portfolio']}\n"
-        summary += "\n"
+            parts.append(f"  {status} {rec['region']}: {rec['n_countries']} countries, {rec['n_sites']} sites, {rec['n_subjects']:,} subjects\n")
+            parts.append(f"     DQI: {rec['avg_dqi']:.3f} | High-risk rate: {rec['key_metrics']['high_risk_rate']:.1f}%")
+            parts.append(f" | vs Portfolio: {rec['comparison_to_portfolio']['dqi_vs_portfolio']}\n")
+        parts.append("\n")
 
     if country_recs and len(country_recs) > 0:
-        summary += """COUNTRIES REQUIRING ATTENTION
+        parts.append("""COUNTRIES REQUIRING ATTENTION
 -----------------------------
-"""
+""")
         for rec in country_recs[:10]:
-            summary += f"  [{rec['priority']}] {rec['country']} ({rec['region']}): {rec['n_sites']} sites, "
-            summary += f"DQI={rec['avg_dqi']:.3f}, High-risk={rec['key_metrics']['high_risk_rate']:.1f}%\n"
+            parts.append(f"  [{rec['priority']}] {rec['country']} ({rec['region']}): {rec['n_sites']} sites, ")
+            parts.append(f"DQI={rec['avg_dqi']:.3f}, High-risk={rec['key_metrics']['high_risk_rate']:.1f}%\n")
             if rec['recommendations']:
-                summary += f"        → {rec['recommendations'][0]}\n"
-        summary += "\n"
+                parts.append(f"        → {rec['recommendations'][0]}\n")
+        parts.append("\n")
 
     if ai_executive_insight:
-        summary += f"""AI-GENERATED INSIGHT
+        parts.append(f"""AI-GENERATED INSIGHT
 --------------------
 {ai_executive_insight}
 
-"""
+""")
 
-    summary += f"""CRITICAL ITEMS REQUIRING IMMEDIATE ACTION
+    parts.append(f"""CRITICAL ITEMS REQUIRING IMMEDIATE ACTION
 -----------------------------------------
-"""
+""")
 
     if pending_sae > 0:
-        summary += f"[!] PENDING SAE REVIEWS: {pending_sae} subjects have SAE records awaiting review\n"
-        summary += "    Action: Immediate pharmacovigilance review required\n\n"
+        parts.append(f"[!] PENDING SAE REVIEWS: {pending_sae} subjects have SAE records awaiting review\n")
+        parts.append("    Action: Immediate pharmacovigilance review required\n\n")
 
     if critical_count > 0:
-        summary += f"[!] CRITICAL SUBJECTS: {critical_count} subjects require immediate intervention\n"
+        parts.append(f"[!] CRITICAL SUBJECTS: {critical_count} subjects require immediate intervention\n")
 
     if critical_sites > 0:
-        summary += f"[!] CRITICAL SITES: {critical_sites} sites flagged for urgent quality review\n"
+        parts.append(f"[!] CRITICAL SITES: {critical_sites} sites flagged for urgent quality review\n")
 
     if pending_sae == 0 and critical_count == 0 and critical_sites == 0:
-        summary += "[OK] No critical items requiring immediate action\n"
+        parts.append("[OK] No critical items requiring immediate action\n")
 
-    summary += """
+    parts.append("""
 TOP PRIORITIES THIS WEEK
 ------------------------
-"""
+""")
 
     for i, rec in enumerate(site_recs[:5], 1):
-        summary += f"{i}. [{rec['priority']}] {rec['study']} - {rec['site_id']} ({rec['country']})\n"
-        summary += f"   DQI Score: {rec['avg_dqi_score']:.3f} | High-risk subjects: {rec['high_risk_count']}\n"
+        parts.append(f"{i}. [{rec['priority']}] {rec['study']} - {rec['site_id']} ({rec['country']})\n")
+        parts.append(f"   DQI Score: {rec['avg_dqi_score']:.3f} | High-risk subjects: {rec['high_risk_count']}\n")
         if rec.get('ai_insight'):
             insight = rec['ai_insight'][:200] + "..." if len(rec['ai_insight']) > 200 else rec['ai_insight']
-            summary += f"   AI Insight: {insight}\n"
+            parts.append(f"   AI Insight: {insight}\n")
         elif rec['recommendations']:
-            summary += f"   Action: {rec['recommendations'][0]}\n"
-        summary += "\n"
+            parts.append(f"   Action: {rec['recommendations'][0]}\n")
+        parts.append("\n")
 
-    summary += """
+    parts.append("""
 RECOMMENDATIONS BY CATEGORY
 ---------------------------
-"""
+""")
 
     for issue_type, count in sorted(issue_counts.items(), key=lambda x: x[1], reverse=True):
         if issue_type in ISSUE_ACTIONS:
             info = ISSUE_ACTIONS[issue_type]
-            summary += f"* {issue_type.replace('_', ' ').title()}: {count} instances\n"
-            summary += f"  Priority: {info['priority']} | Action: {info['action']}\n\n"
+            parts.append(f"* {issue_type.replace('_', ' ').title()}: {count} instances\n")
+            parts.append(f"  Priority: {info['priority']} | Action: {info['action']}\n\n")
 
-    summary += """
+    parts.append("""
 ================================================================================
-"""
+""")
 
-    return summary
+    return "".join(parts)
 
 
 def generate_site_action_report(site_recs: List[Dict]) -> str:
     """Generate a detailed action report for sites."""
-    report = """
+    parts = ["""
 ================================================================================
 SITE-LEVEL ACTION REPORT
 ================================================================================
-"""
+"""]
 
     for i, rec in enumerate(site_recs[:50], 1):
-        report += f"""
+        parts.append(f"""
 --------------------------------------------------------------------------------
 {i}. {rec['study']} - {rec['site_id']} ({rec['country']}, {rec['region']})
 --------------------------------------------------------------------------------
 Priority: {rec['priority']}
 Subjects: {rec['subject_count']} | High-Risk: {rec['high_risk_count']}
 Average DQI: {rec['avg_dqi_score']:.3f} | Max DQI: {rec['max_dqi_score']:.3f}
-"""
+""")
 
         if rec.get('ai_insight'):
-            report += f"""
+            parts.append(f"""
 AI Analysis:
 {rec['ai_insight']}
-"""
+""")
 
-        report += "\nIssues Identified:\n"
+        parts.append("\nIssues Identified:\n")
         for issue in rec['issues'][:5]:
-            report += f"  * {issue['type'].replace('_', ' ').title()}: {issue['total_count']} instances [{issue['priority']}]\n"
-            report += f"    Action: {issue['action']}\n"
+            parts.append(f"  * {issue['type'].replace('_', ' ').title()}: {issue['total_count']} instances [{issue['priority']}]\n")
+            parts.append(f"    Action: {issue['action']}\n")
 
         if rec['root_causes']:
-            report += "\nPotential Root Causes:\n"
+            parts.append("\nPotential Root Causes:\n")
             for cause in rec['root_causes']:
-                report += f"  * {cause}\n"
+                parts.append(f"  * {cause}\n")
 
         if rec['recommendations']:
-            report += "\nRecommended Actions:\n"
+            parts.append("\nRecommended Actions:\n")
             for action in rec['recommendations']:
-                report += f"  - {action}\n"
+                parts.append(f"  - {action}\n")
 
-        report += "\n"
+        parts.append("\n")
 
-    return report
+    return "".join(parts)
 
 
 # ============================================================================
@@ -927,7 +992,7 @@ def save_outputs(
     study_recs: List[Dict],
     executive_summary: str,
     site_report: str,
-    data: Dict[str, pd.DataFrame],
+    data: Dict[str, Union[pd.DataFrame, int]],
     llm_model: str = None,
     region_recs: List[Dict] = None,
     country_recs: List[Dict] = None
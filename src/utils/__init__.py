@@ -48,6 +48,8 @@ from .dqi_calculator import (
 
 # Aggregation Utilities
 from .aggregation import (
+    aggregate_with_score_stats,
+    count_by_group,
     aggregate_to_site,
     aggregate_to_study,
     aggregate_to_region,
@@ -92,6 +94,8 @@ __all__ = [
     'get_risk_distribution',
     'validate_dqi_weights',
     # Aggregation
+    'aggregate_with_score_stats',
+    'count_by_group',
     'aggregate_to_site',
     'aggregate_to_study',
     'aggregate_to_region',
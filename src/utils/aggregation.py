@@ -15,6 +15,8 @@ Each level computes:
     - Risk distribution percentages
 
 Functions:
+    - aggregate_with_score_stats: groupby.agg with a one-pass mean/max/std
+    - count_by_group: Per-group count of a boolean mask via bincount
     - aggregate_to_site: Subject → Site aggregation
     - aggregate_to_study: Site → Study aggregation
     - aggregate_to_region: Study → Region aggregation
@@ -30,6 +32,112 @@ import warnings
 warnings.filterwarnings('ignore')
 
 
+def _group_codes(grouped) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer group code per row of the grouped frame, plus a mask of rows in a group."""
+    codes = grouped.ngroup()
+    valid = codes.notna().to_numpy()
+    return codes.to_numpy()[valid].astype(np.int64), valid
+
+
+def count_by_group(grouped, mask) -> np.ndarray:
+    """
+    Count the True entries of a row mask in each group with one bincount.
+
+    Args:
+        grouped: GroupBy object
+        mask: Boolean array/Series aligned with the grouped frame's rows
+
+    Returns:
+        int64 array of counts, one per group in ``grouped`` order
+    """
+    codes, valid = _group_codes(grouped)
+    mask = np.asarray(mask, dtype=bool)[valid]
+    return np.bincount(codes[mask], minlength=grouped.ngroups)
+
+
+def aggregate_with_score_stats(
+    grouped,
+    agg_dict: Dict[str, object],
+    score_col: str
+) -> pd.DataFrame:
+    """
+    Run ``grouped.agg(agg_dict)`` with flattened ``{col}_{func}`` names.
+
+    The ``score_col`` entry (expected to be ``['mean', 'max', 'std']``) is
+    taken out of the pandas aggregation: its mean, max and sample std are
+    computed from the group codes with bincount reductions, so the score
+    column is scanned once for all three statistics instead of once per
+    aggregator. NaN scores are skipped and each statistic uses the
+    group's non-NaN count, as in pandas. The remaining entries are batched by reduction, so each
+    distinct named function (``sum``, ``count``, ``mean``, ...) runs as a
+    single multi-column cythonized groupby call instead of one dispatch per
+    column; callables fall back to ``grouped.agg``. Column order and naming
+    match what ``agg`` would produce.
+
+    Args:
+        grouped: GroupBy object (e.g. ``df.groupby('study', observed=True)``)
+        agg_dict: Aggregation spec, including ``score_col``
+        score_col: Score column whose mean/max/std are needed
+
+    Returns:
+        Aggregated DataFrame indexed by the group keys
+    """
+    rest = {
+        col: [funcs] if isinstance(funcs, str) else list(funcs)
+        for col, funcs in agg_dict.items() if col != score_col
+    }
+    columns_by_func = {}
+    for col, funcs in rest.items():
+        for func in funcs:
+            if isinstance(func, str):
+                columns_by_func.setdefault(func, []).append(col)
+    reduced = {
+        func: getattr(grouped[cols], func)()
+        for func, cols in columns_by_func.items()
+    }
+    columns = {}
+    for col, funcs in rest.items():
+        # Callables go through agg, which also supplies their names
+        fallback = None if all(isinstance(f, str) for f in funcs) else grouped.agg({col: funcs})
+        for i, func in enumerate(funcs):
+            if isinstance(func, str):
+                columns[f'{col}_{func}'.strip('_')] = reduced[func][col]
+            else:
+                columns['_'.join(fallback.columns[i]).strip('_')] = fallback.iloc[:, i]
+    agg_df = pd.DataFrame(columns, index=grouped.size().index)
+
+    codes, valid = _group_codes(grouped)
+    values = grouped.obj[score_col].to_numpy(dtype=float)[valid]
+    n_groups = grouped.ngroups
+
+    # NaN scores are skipped, as groupby.agg does: drop them before any reduction
+    present = ~np.isnan(values)
+    codes, values = codes[present], values[present]
+
+    count = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes, weights=values, minlength=n_groups) / count
+        m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n_groups)
+        std = np.sqrt(m2 / (count - 1))
+    std[count < 2] = np.nan
+
+    maximum = np.full(n_groups, -np.inf)
+    np.maximum.at(maximum, codes, values)
+    maximum[count == 0] = np.nan
+
+    # Insert where the score entry sat in the original spec
+    loc = 0
+    for col in agg_dict:
+        if col == score_col:
+            break
+        loc += len(rest[col])
+    agg_df.insert(loc, f'{score_col}_mean', mean)
+    agg_df.insert(loc + 1, f'{score_col}_max', maximum)
+    agg_df.insert(loc + 2, f'{score_col}_std', std)
+
+    return agg_df
+
+
 def aggregate_to_site(
     df: pd.DataFrame,
     group_cols: List[str] = None,
@@ -72,10 +180,6 @@ def aggregate_to_site(
         except ImportError:
             feature_cols = []
 
-    # Create binary risk columns
-    df['is_high'] = (df[risk_col] == 'High').astype(int)
-    df['is_medium'] = (df[risk_col] == 'Medium').astype(int)
-
     # Ensure has_issues exists
     if 'has_issues' not in df.columns:
         if 'n_issue_types' in df.columns:
@@ -88,8 +192,6 @@ def aggregate_to_site(
         'subject_id': 'count',
         dqi_score_col: ['mean', 'max', 'std'],
         'n_issue_types': ['sum', 'mean'] if 'n_issue_types' in df.columns else ['count'],
-        'is_high': 'sum',
-        'is_medium': 'sum',
         'has_issues': 'sum',
     }
 
@@ -98,14 +200,15 @@ def aggregate_to_site(
         if col in df.columns:
             agg_dict[col] = 'sum'
 
-    # Perform aggregation
-    site_df = df.groupby(group_cols).agg(agg_dict)
+    # Perform aggregation (flattened column names)
+    grouped = df.groupby(group_cols, observed=True)
+    site_df = aggregate_with_score_stats(grouped, agg_dict, dqi_score_col)
 
-    # Flatten column names
-    site_df.columns = [
-        '_'.join(col).strip('_') if isinstance(col, tuple) else col
-        for col in site_df.columns
-    ]
+    # Risk category counts from the group codes
+    risk = df[risk_col].to_numpy()
+    loc = site_df.columns.get_loc('has_issues_sum')
+    site_df.insert(loc, 'high_risk_count', count_by_group(grouped, risk == 'High'))
+    site_df.insert(loc + 1, 'medium_risk_count', count_by_group(grouped, risk == 'Medium'))
     site_df = site_df.reset_index()
 
     # Rename columns
@@ -116,8 +219,6 @@ def aggregate_to_site(
         f'{dqi_score_col}_std': 'std_dqi_score',
         'n_issue_types_sum': 'total_issue_types',
         'n_issue_types_mean': 'avg_issue_types',
-        'is_high_sum': 'high_risk_count',
-        'is_medium_sum': 'medium_risk_count',
         'has_issues_sum': 'subjects_with_issues',
     }
     site_df = site_df.rename(columns=rename_map)
@@ -175,13 +276,10 @@ def aggregate_to_study(
         if col in site_df.columns:
             agg_dict[col] = 'sum'
 
-    study_df = site_df.groupby('study').agg(agg_dict)
-
-    # Flatten columns
-    study_df.columns = [
-        '_'.join(col).strip('_') if isinstance(col, tuple) else col
-        for col in study_df.columns
-    ]
+    # Aggregate (flattened column names)
+    study_df = aggregate_with_score_stats(
+        site_df.groupby('study', observed=True), agg_dict, score_col
+    )
     study_df = study_df.reset_index()
 
     # Rename columns
@@ -237,13 +335,10 @@ def aggregate_to_region(
         'medium_risk_count': 'sum',
     }
 
-    region_df = site_df.groupby('region').agg(agg_dict)
-
-    # Flatten columns
-    region_df.columns = [
-        '_'.join(col).strip('_') if isinstance(col, tuple) else col
-        for col in region_df.columns
-    ]
+    # Aggregate (flattened column names)
+    region_df = aggregate_with_score_stats(
+        site_df.groupby('region', observed=True), agg_dict, score_col
+    )
     region_df = region_df.reset_index()
 
     # Rename columns
@@ -298,13 +393,10 @@ def aggregate_to_country(
         'medium_risk_count': 'sum',
     }
 
-    country_df = site_df.groupby('country').agg(agg_dict)
-
-    # Flatten columns
-    country_df.columns = [
-        '_'.join(col).strip('_') if isinstance(col, tuple) else col
-        for col in country_df.columns
-    ]
+    # Aggregate (flattened column names)
+    country_df = aggregate_with_score_stats(
+        site_df.groupby('country', observed=True), agg_dict, score_col
+    )
     country_df = country_df.reset_index()
 
     # Rename columns
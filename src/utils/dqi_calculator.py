@@ -18,6 +18,7 @@ Risk Categories:
 
 Functions:
     - calculate_reference_max: Compute reference maximum for severity scaling
+    - calculate_component_matrix: Weighted scores for a whole feature matrix
     - calculate_component_score: Calculate weighted score for a feature
     - calculate_dqi_with_weights: Calculate full DQI score with custom weights
     - assign_risk_categories: Assign High/Medium/Low risk categories
@@ -50,8 +51,12 @@ def calculate_reference_max(
     otherwise falls back to the maximum value. This prevents extreme
     outliers from dominating the severity calculation.
 
+    The percentile is taken with np.quantile, which selects the two
+    neighbouring order statistics with a partition (O(n)) rather than a
+    full sort, and interpolates linearly between them like pandas does.
+
     Args:
-        series: Input series with numeric values
+        series: Input series (or 1-D array) with numeric values
         min_samples: Minimum non-zero samples required for percentile
         percentile: Percentile to use for reference (default: 0.95)
 
@@ -63,10 +68,11 @@ def calculate_reference_max(
         >>> calculate_reference_max(s, min_samples=5)  # Uses 95th percentile
         >>> calculate_reference_max(s, min_samples=100)  # Uses max (100)
     """
-    non_zero = series[series > 0]
+    values = np.asarray(series, dtype=float)
+    non_zero = values[values > 0]
 
     if len(non_zero) >= min_samples:
-        ref_max = non_zero.quantile(percentile)
+        ref_max = np.quantile(non_zero, percentile)
         if ref_max <= 0:
             ref_max = non_zero.max()
     elif len(non_zero) > 0:
@@ -78,6 +84,50 @@ def calculate_reference_max(
     return max(ref_max, 1.0)
 
 
+def calculate_component_matrix(
+    X: np.ndarray,
+    weights,
+    reference_max,
+    binary_weight: float = 0.5,
+    severity_weight: float = 0.5,
+    issue_mask: np.ndarray = None
+) -> np.ndarray:
+    """
+    Calculate Binary + Severity component scores for every feature at once.
+
+    Vectorized form of calculate_component_score over an (n_subjects x
+    n_features) matrix: one broadcast expression instead of a per-feature
+    loop of Series operations. A 1-D array is treated as a single feature.
+    The arithmetic is done in place on a single output buffer, so apart
+    from the issue mask no (n x k) temporaries are allocated.
+
+    A NaN value yields a NaN score rather than 0.
+
+    Args:
+        X: Raw feature values, one column per feature
+        weights: Weight per feature (scalar or array of length n_features)
+        reference_max: Severity reference per feature (scalar or array)
+        binary_weight: Weight for binary component (default: 0.5)
+        severity_weight: Weight for severity component (default: 0.5)
+        issue_mask: Precomputed X > 0, if the caller already has it
+
+    Returns:
+        Array of component scores with the same shape as X
+    """
+    # scores = weights * (binary_weight + severity_weight * severity)
+    scores = np.divide(X, reference_max, dtype=float)
+    np.clip(scores, 0, 1, out=scores)
+    scores *= severity_weight
+    scores += binary_weight
+    scores *= weights
+
+    # Rows without an issue score exactly 0; NaN values stay NaN
+    if issue_mask is None:
+        issue_mask = X > 0
+    np.copyto(scores, 0.0, where=~(issue_mask | np.isnan(X)))
+    return scores
+
+
 def calculate_component_score(
     series: pd.Series,
     weight: float,
@@ -113,19 +163,16 @@ def calculate_component_score(
     if series.max() == 0:
         return pd.Series(0.0, index=series.index)
 
-    # Binary component: 1 if has issue, 0 otherwise
-    binary = (series > 0).astype(float)
-
     # Calculate reference maximum for severity scaling
     reference_max = calculate_reference_max(series, min_samples)
 
-    # Severity component: scaled by reference max
-    severity = (series / reference_max).clip(0, 1)
+    # Combined binary + severity score; rows without an issue score exactly 0
+    score = calculate_component_matrix(
+        series.to_numpy(dtype=float), weight, reference_max,
+        binary_weight=binary_weight, severity_weight=severity_weight
+    )
 
-    # Combined score with weights
-    score = weight * (binary_weight * binary + severity_weight * severity)
-
-    return score
+    return pd.Series(score, index=series.index)
 
 
 def calculate_dqi_with_weights(
@@ -151,21 +198,17 @@ def calculate_dqi_with_weights(
         >>> weights = {'sae_pending_count': 0.20, 'missing_visit_count': 0.15, ...}
         >>> scores = calculate_dqi_with_weights(df, weights)
     """
-    df = df.copy()
-    df['dqi_score_calc'] = 0.0
-
-    for feature, weight in weights.items():
-        if feature not in df.columns:
-            continue
+    features = [f for f in weights.keys() if f in df.columns]
+    X = df[features].to_numpy(dtype=float)
+    reference_max = np.array([
+        calculate_reference_max(X[:, j], min_samples) for j in range(len(features))
+    ])
+    component_matrix = calculate_component_matrix(
+        X, np.array([weights[f] for f in features], dtype=float), reference_max
+    )
 
-        component = calculate_component_score(
-            df[feature],
-            weight=weight,
-            min_samples=min_samples
-        )
-        df['dqi_score_calc'] += component
-
-    return df['dqi_score_calc'].clip(0, 1)
+    dqi = np.clip(component_matrix.sum(axis=1), 0, 1)
+    return pd.Series(dqi, index=df.index, name='dqi_score_calc')
 
 
 def assign_risk_categories(
@@ -287,43 +330,48 @@ def calculate_subject_dqi(
 
     df = df.copy()
 
-    # Calculate n_issue_types
+    # Calculate n_issue_types from the issue columns as one ndarray
     issue_columns = [
         col for col in feature_weights.keys()
         if col in df.columns and col != 'n_issue_types'
     ]
-    df['n_issue_types'] = (df[issue_columns] > 0).sum(axis=1)
-
-    # Initialize DQI score
-    df['dqi_score'] = 0.0
+    issue_values = df[issue_columns].to_numpy(dtype=float)
+    df['n_issue_types'] = np.count_nonzero(issue_values > 0, axis=1)
+
+    # Feature matrix (one column per feature) and per-feature parameters,
+    # reusing the issue columns extracted above
+    features = [f for f in feature_weights.keys() if f in df.columns]
+    if not features:
+        df['dqi_score'] = 0.0
+        return df, {}
+    configs = [feature_weights[f] for f in features]
+    weights = np.array([c['weight'] if isinstance(c, dict) else c for c in configs], dtype=float)
+    feature_columns = dict(zip(issue_columns, issue_values.T))
+    feature_columns['n_issue_types'] = df['n_issue_types'].to_numpy(dtype=float)
+    X = np.array([feature_columns[f] for f in features]).T  # column-major
+    reference_max = np.array([calculate_reference_max(X[:, j]) for j in range(len(features))])
+
+    # All components in one vectorized pass, then a single row-wise sum
+    component_matrix = calculate_component_matrix(X, weights, reference_max)
+    df['dqi_score'] = np.clip(component_matrix.sum(axis=1), 0, 1)
+
+    # Attach components and track statistics for reporting
+    subjects_with_issue = (X > 0).sum(axis=0)
     components = {}
-
-    # Calculate each component
-    for feature, config in feature_weights.items():
-        if feature not in df.columns:
-            continue
-
-        weight = config['weight'] if isinstance(config, dict) else config
-        tier = config.get('tier', 'Unknown') if isinstance(config, dict) else 'Unknown'
-
-        component = calculate_component_score(df[feature], weight)
+    for j, (feature, config) in enumerate(zip(features, configs)):
+        component = component_matrix[:, j]
         df[f'{feature}_component'] = component
-        df['dqi_score'] += component
 
-        # Track component statistics
         components[feature] = {
-            'weight': weight,
-            'tier': tier,
-            'subjects_with_issue': (df[feature] > 0).sum(),
-            'mean_raw_value': df[feature].mean(),
-            'max_raw_value': df[feature].max(),
-            'mean_component': component.mean(),
-            'max_component': component.max(),
+            'weight': weights[j],
+            'tier': config.get('tier', 'Unknown') if isinstance(config, dict) else 'Unknown',
+            'subjects_with_issue': subjects_with_issue[j],
+            'mean_raw_value': np.nanmean(X[:, j]),
+            'max_raw_value': np.nanmax(X[:, j]),
+            'mean_component': np.nanmean(component),
+            'max_component': np.nanmax(component),
         }
 
-    # Clip final score to [0, 1]
-    df['dqi_score'] = df['dqi_score'].clip(0, 1)
-
     return df, components
 
 
@@ -16,6 +16,7 @@ Tests: 10 classes, ~80 tests covering:
   - Cross-phase consistency
   - K-Fold validation results
   - Dashboard readiness
+  - DQI calculator & aggregation utilities
 
 Run:
   pytest tests/test_pipeline.py -v                    # All tests
@@ -1149,6 +1150,171 @@ class TestDashboardReadiness:
         assert not missing, f"Dashboard missing screens: {missing}"
 
 
+# ============================================================================
+# TEST 15: DQI CALCULATOR UTILITIES
+# ============================================================================
+
+class TestDQICalculatorUtility:
+    """Unit tests for the vectorized DQI scoring helpers in utils."""
+
+    WEIGHTS = {
+        'sae_pending_count': {'weight': 0.6, 'tier': 'Safety'},
+        'missing_visit_count': {'weight': 0.4, 'tier': 'Completeness'},
+    }
+
+    def test_component_matrix_scores(self):
+        """Binary + severity per column; rows without an issue score 0."""
+        from utils.dqi_calculator import calculate_component_matrix
+        X = np.array([[0.0, 2.0], [4.0, 0.0], [8.0, 1.0]])
+        scores = calculate_component_matrix(X, np.array([0.6, 0.4]), np.array([4.0, 2.0]))
+        expected = np.array([
+            [0.0, 0.4 * (0.5 + 0.5)],
+            [0.6 * (0.5 + 0.5), 0.0],
+            [0.6 * (0.5 + 0.5), 0.4 * (0.5 + 0.25)],
+        ])
+        assert np.allclose(scores, expected)
+
+    def test_component_matrix_propagates_nan(self):
+        """A NaN feature value yields a NaN component, not 0."""
+        from utils.dqi_calculator import calculate_component_matrix
+        X = np.array([[np.nan, 1.0], [0.0, 2.0]])
+        scores = calculate_component_matrix(X, np.array([0.5, 0.5]), np.array([1.0, 2.0]))
+        assert np.isnan(scores[0, 0])
+        assert scores[1, 0] == 0.0
+        assert not np.isnan(scores[:, 1]).any()
+
+    def test_subject_dqi_without_weighted_features(self):
+        """No weighted feature present: every subject scores 0."""
+        from utils.dqi_calculator import calculate_subject_dqi
+        df = pd.DataFrame({'subject_id': ['S1', 'S2'], 'other': [3, 0]})
+        result, components = calculate_subject_dqi(df, self.WEIGHTS)
+        assert (result['dqi_score'] == 0).all()
+        assert (result['n_issue_types'] == 0).all()
+        assert components == {}
+
+    def test_subject_dqi_nan_feature(self):
+        """NaN propagates to the score; the raw-value stats skip it."""
+        from utils.dqi_calculator import calculate_subject_dqi
+        df = pd.DataFrame({
+            'sae_pending_count': [np.nan, 1.0, 3.0],
+            'missing_visit_count': [0.0, 2.0, 0.0],
+        })
+        result, components = calculate_subject_dqi(df, self.WEIGHTS)
+        assert np.isnan(result['dqi_score'].iloc[0])
+        assert result['dqi_score'].iloc[1:].between(0, 1).all()
+
+        sae = components['sae_pending_count']
+        assert sae['subjects_with_issue'] == 2
+        assert sae['mean_raw_value'] == pytest.approx(2.0)
+        assert sae['max_raw_value'] == 3.0
+        assert not np.isnan(sae['mean_component'])
+
+    def test_phase03_subject_dqi_nan_feature(self):
+        """Phase 03's own scorer: NaN propagates to the score, not to the stats."""
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(
+            'calculate_dqi', SRC_DIR / "phases" / "03_calculate_dqi.py")
+        phase03 = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(phase03)
+
+        df = pd.DataFrame({
+            'sae_pending_count': [np.nan, 1.0, 3.0],
+            'missing_visit_count': [0.0, 2.0, 0.0],
+        })
+        result, components = phase03.calculate_subject_dqi(df)
+        assert np.isnan(result['dqi_score'].iloc[0])
+        assert result['dqi_score'].iloc[1:].between(0, 1).all()
+
+        sae = components['sae_pending_count']
+        assert sae['subjects_with_issue'] == 2
+        assert sae['mean_raw_value'] == pytest.approx(2.0)
+        assert sae['max_raw_value'] == 3.0
+        assert not np.isnan(sae['mean_component'])
+        assert not np.isnan(sae['max_component'])
+
+
+# ============================================================================
+# TEST 16: AGGREGATION UTILITIES
+# ============================================================================
+
+class TestAggregationUtility:
+    """Unit tests for the group-code aggregation helpers in utils."""
+
+    @pytest.fixture
+    def scores(self):
+        return pd.DataFrame({
+            'study': ['A', 'A', 'A', 'B', 'B', 'C'],
+            'site_id': ['S1', 'S1', 'S2', 'S1', 'S1', 'S1'],
+            'dqi_score': [0.2, 0.4, 0.9, np.nan, 0.5, np.nan],
+            'n_issues': [1, 2, 3, 0, 1, 4],
+        })
+
+    def test_score_stats_match_pandas(self, scores):
+        """Multi-key groups: same values, columns and index as groupby.agg."""
+        from utils.aggregation import aggregate_with_score_stats
+        spec = {'n_issues': ['sum', 'mean'], 'dqi_score': ['mean', 'max', 'std'], 'site_id': 'count'}
+        grouped = scores.groupby(['study', 'site_id'], observed=True)
+
+        result = aggregate_with_score_stats(grouped, spec, 'dqi_score')
+        expected = grouped.agg({k: v if isinstance(v, list) else [v] for k, v in spec.items()})
+        expected.columns = ['_'.join(col) for col in expected.columns]
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+    def test_score_stats_skip_nan(self, scores):
+        """NaN scores are skipped; an all-NaN group gives NaN statistics."""
+        from utils.aggregation import aggregate_with_score_stats
+        result = aggregate_with_score_stats(
+            scores.groupby('study'), {'dqi_score': ['mean', 'max', 'std']}, 'dqi_score'
+        )
+        assert result.loc['A', 'dqi_score_mean'] == pytest.approx(0.5)
+        assert result.loc['B', 'dqi_score_mean'] == pytest.approx(0.5)
+        assert result.loc['B', 'dqi_score_max'] == pytest.approx(0.5)
+        assert result.loc['C'].isna().all()
+
+    def test_score_stats_single_row_std(self, scores):
+        """A group with one (non-NaN) score has a NaN sample std."""
+        from utils.aggregation import aggregate_with_score_stats
+        grouped = scores.groupby(['study', 'site_id'], observed=True)
+        result = aggregate_with_score_stats(grouped, {'dqi_score': ['mean', 'max', 'std']}, 'dqi_score')
+        assert np.isnan(result.loc[('A', 'S2'), 'dqi_score_std'])
+        assert np.isnan(result.loc[('B', 'S1'), 'dqi_score_std'])
+        assert result.loc[('A', 'S1'), 'dqi_score_std'] == pytest.approx(np.std([0.2, 0.4], ddof=1))
+
+    def test_score_only_spec_keeps_group_index(self, scores):
+        """A spec naming only the score column is still indexed by the group keys."""
+        from utils.aggregation import aggregate_with_score_stats
+        grouped = scores.groupby(['study', 'site_id'], observed=True)
+        result = aggregate_with_score_stats(grouped, {'dqi_score': ['mean', 'max', 'std']}, 'dqi_score')
+        assert list(result.columns) == ['dqi_score_mean', 'dqi_score_max', 'dqi_score_std']
+        assert result.index.equals(grouped.size().index)
+
+    def test_callable_entries(self, scores):
+        """Callables in the spec are aggregated and named as groupby.agg does."""
+        from utils.aggregation import aggregate_with_score_stats
+        spread = lambda v: v.max() - v.min()
+        result = aggregate_with_score_stats(
+            scores.groupby('study'), {'n_issues': ['sum', spread], 'dqi_score': ['mean', 'max', 'std']},
+            'dqi_score'
+        )
+        assert list(result.columns[:2]) == ['n_issues_sum', 'n_issues_<lambda_0>']
+        assert result['n_issues_<lambda_0>'].tolist() == [2, 1, 0]
+
+    def test_count_by_group(self, scores):
+        """Per-group count of a row mask, in group order, zero for no hits."""
+        from utils.aggregation import count_by_group
+        grouped = scores.groupby(['study', 'site_id'], observed=True)
+        counts = count_by_group(grouped, scores['n_issues'] > 1)
+        expected = (scores['n_issues'] > 1).groupby([scores['study'], scores['site_id']]).sum()
+        assert counts.tolist() == expected.tolist()
+
+    def test_dqi_with_weights_without_features(self):
+        """No weighted feature present: every score is 0."""
+        from utils.dqi_calculator import calculate_dqi_with_weights
+        df = pd.DataFrame({'other': [1, 2, 3]})
+        result = calculate_dqi_with_weights(df, {'sae_pending_count': 1.0})
+        assert (result == 0).all() and len(result) == 3
+
+
 # ============================================================================
 # MAIN
 # ============================================================================